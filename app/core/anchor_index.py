@@ -0,0 +1,174 @@
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib  # optional: approximate nearest neighbours for large anchor sets
+except ImportError:
+    hnswlib = None
+
+
+class AnchorIndex:
+    """
+    Nearest-anchor lookup for the Simple tier.
+
+    Anchors live in one L2-normalized matrix, so a search is a single matrix
+    product + vectorized top-k. Past `ann_threshold` anchors (and if hnswlib is
+    installed) an HNSW graph is used instead of the dense scan.
+    add() / remove() are incremental and safe to call while serving.
+    """
+
+    def __init__(self, dim: int, ann_threshold: int = 5000, initial_capacity: int = 64):
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[int] = []
+        self._labels: List[str] = []
+        self._texts: List[str] = []
+        self._pos = {}  # anchor id -> row in _matrix
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self._ann = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def add(self, texts: List[str], vectors, labels: List[str]) -> List[int]:
+        vectors = self._normalize(vectors)
+        if not (len(texts) == len(labels) == len(vectors)):
+            raise ValueError("texts, vectors and labels must have the same length")
+
+        with self._lock:
+            needed = self._size + len(vectors)
+            if needed > len(self._matrix):
+                capacity = max(needed, len(self._matrix) * 2)
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+
+            new_ids = list(range(self._next_id, self._next_id + len(vectors)))
+            self._next_id += len(vectors)
+
+            self._matrix[self._size:needed] = vectors
+            for offset, anchor_id in enumerate(new_ids):
+                self._pos[anchor_id] = self._size + offset
+            self._ids.extend(new_ids)
+            self._labels.extend(labels)
+            self._texts.extend(texts)
+            self._size = needed
+
+            if self._ann is not None:
+                self._ann_add(vectors, new_ids)
+            elif hnswlib is not None and self._size >= self.ann_threshold:
+                self._build_ann()
+
+            return new_ids
+
+    def remove(self, anchor_ids: List[int]) -> int:
+        removed = 0
+        with self._lock:
+            for anchor_id in anchor_ids:
+                pos = self._pos.pop(anchor_id, None)
+                if pos is None:
+                    continue
+                # Swap the last row into the hole: O(dim) instead of O(n)
+                last = self._size - 1
+                if pos != last:
+                    self._matrix[pos] = self._matrix[last]
+                    self._ids[pos] = self._ids[last]
+                    self._labels[pos] = self._labels[last]
+                    self._texts[pos] = self._texts[last]
+                    self._pos[self._ids[pos]] = pos
+                self._ids.pop()
+                self._labels.pop()
+                self._texts.pop()
+                self._size -= 1
+                removed += 1
+
+                if self._ann is not None:
+                    self._ann.mark_deleted(anchor_id)
+
+            if self._ann is not None and self._size < self.ann_threshold // 2:
+                # Shrunk well below the threshold: the dense scan is cheaper again
+                self._ann = None
+
+        return removed
+
+    def search(self, queries, k: int = 1) -> Tuple[np.ndarray, List[List[int]]]:
+        """
+        Returns (scores (m, k), anchor ids per query), highest similarity first.
+        """
+        queries = self._normalize(queries)
+        with self._lock:
+            if self._size == 0:
+                return np.zeros((len(queries), 0), dtype=np.float32), [[] for _ in queries]
+            k = min(k, self._size)
+
+            if self._ann is not None:
+                labels, distances = self._ann.knn_query(queries, k=k)
+                return (1.0 - distances).astype(np.float32), labels.tolist()
+
+            scores = queries @ self._matrix[:self._size].T
+            if k == 1:
+                top = scores.argmax(axis=1)[:, None]
+            else:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+                top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            ids = [[self._ids[p] for p in row] for row in top]
+            return top_scores, ids
+
+    def nearest(self, queries) -> Tuple[List[float], List[Optional[str]]]:
+        """
+        Best score and label of the closest anchor for each query.
+        """
+        scores, ids = self.search(queries, k=1)
+        with self._lock:
+            best_scores, labels = [], []
+            for row_scores, row_ids in zip(scores, ids):
+                pos = self._pos.get(row_ids[0]) if row_ids else None
+                if pos is None:
+                    best_scores.append(0.0)
+                    labels.append(None)
+                else:
+                    best_scores.append(float(row_scores[0]))
+                    labels.append(self._labels[pos])
+            return best_scores, labels
+
+    def stats(self) -> dict:
+        with self._lock:
+            label_counts = {}
+            for label in self._labels:
+                label_counts[label] = label_counts.get(label, 0) + 1
+            return {
+                "anchors": self._size,
+                "mode": "hnsw" if self._ann is not None else "dense",
+                "ann_threshold": self.ann_threshold,
+                "ann_available": hnswlib is not None,
+                "labels": label_counts,
+            }
+
+    # --- Approximate NN (hnswlib) ---
+    def _build_ann(self):
+        capacity = max(self._size * 2, self.ann_threshold)
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=capacity, ef_construction=200, M=16, allow_replace_deleted=True)
+        index.set_ef(64)
+        index.add_items(self._matrix[:self._size], np.asarray(self._ids))
+        self._ann = index
+
+    def _ann_add(self, vectors: np.ndarray, ids: List[int]):
+        needed = self._ann.get_current_count() + len(ids)
+        if needed > self._ann.get_max_elements():
+            self._ann.resize_index(needed * 2)
+        self._ann.add_items(vectors, np.asarray(ids), replace_deleted=True)
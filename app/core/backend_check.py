@@ -0,0 +1,85 @@
+"""
+Checks that an alternative embedding backend routes like the fp32 torch backend.
+
+    python -m app.core.backend_check --backend torch-int8
+    python -m app.core.backend_check --backend onnx-int8 --csv data/demo_dataset.csv --tolerance 0.03
+
+Exits non-zero when a routing decision differs or an anchor score drifts by
+more than the tolerance. Also prints complaints/sec for both backends.
+"""
+import argparse
+import csv
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from app.core.embedding_backends import load_backend
+from app.core.router import EMBED_MODEL_NAME, simple_anchors, simple_anchor_labels, _decide
+
+
+def load_texts(csv_path: str) -> List[str]:
+    with open(csv_path, "r", newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.DictReader(f)
+        cols = reader.fieldnames or []
+        text_col = next((c for c in cols if "text" in c.lower() or "complaint" in c.lower()), cols[0])
+        return [(row.get(text_col) or "").strip() for row in reader]
+
+
+def score_backend(name: str, texts: List[str], repeats: int = 3):
+    backend = load_backend(name, EMBED_MODEL_NAME)
+    anchors = backend.encode(simple_anchors, normalize=True)
+
+    backend.encode(texts[:8], normalize=True)  # warm kernels before timing
+    start = time.perf_counter()
+    for _ in range(repeats):
+        vectors = backend.encode(texts, normalize=True)
+    elapsed = time.perf_counter() - start
+
+    scores = vectors @ anchors.T
+    best_scores = scores.max(axis=1)
+    labels = [simple_anchor_labels[simple_anchors[i]] for i in scores.argmax(axis=1)]
+    decisions = [_decide(t, float(s), label) for t, s, label in zip(texts, best_scores, labels)]
+    throughput = len(texts) * repeats / elapsed if elapsed > 0 else float("inf")
+    return best_scores, decisions, throughput
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare an embedding backend against fp32 torch.")
+    parser.add_argument("--backend", default="torch-int8")
+    parser.add_argument("--reference", default="torch")
+    parser.add_argument("--csv", default="data/demo_dataset.csv")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="max allowed anchor-score drift")
+    args = parser.parse_args()
+
+    texts = load_texts(args.csv)
+    if not texts:
+        print(f"No rows found in {args.csv}")
+        return 1
+
+    ref_scores, ref_decisions, ref_tput = score_backend(args.reference, texts)
+    cand_scores, cand_decisions, cand_tput = score_backend(args.backend, texts)
+
+    drift = np.abs(ref_scores - cand_scores)
+    mismatches = [
+        (t, r.decision, c.decision, r.tags, c.tags)
+        for t, r, c in zip(texts, ref_decisions, cand_decisions)
+        if (r.decision, r.tags) != (c.decision, c.tags)
+    ]
+
+    print(f"Rows:                 {len(texts)}")
+    print(f"{args.reference:<22}{ref_tput:,.1f} complaints/sec")
+    print(f"{args.backend:<22}{cand_tput:,.1f} complaints/sec ({cand_tput / ref_tput:.2f}x)")
+    print(f"Max anchor-score drift: {drift.max():.4f} (mean {drift.mean():.4f}, tolerance {args.tolerance})")
+    print(f"Decision mismatches:  {len(mismatches)}")
+    for text, ref_d, cand_d, ref_tags, cand_tags in mismatches:
+        print(f"  - {ref_d}{ref_tags} -> {cand_d}{cand_tags}: {text[:80]}")
+
+    ok = not mismatches and drift.max() <= args.tolerance
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+def batch_row_id(job_id: str, row: int) -> str:
+    """
+    Complaint id of an upload row: stable across resumes, unique across jobs.
+    """
+    return f"req_{job_id}_{row}"
+
+
+class BatchDeduper:
+    """
+    Collapses exact duplicates within one batch upload.
+
+    unique() sits between the CSV rows and the router: it records every row in
+    upload order but only passes a text on the first time its normalized form
+    (case and whitespace folded) is seen. windows() lines the router's output
+    back up with those rows; a duplicate takes the outcome stored for its
+    first occurrence, which always comes earlier in the upload.
+
+    Memory is bounded whatever the upload size:
+    - the rows read ahead of the router: once `max_backlog` rows are buffered,
+      unique() passes duplicates on to the router too (their routing is
+      ignored), so a long run of duplicates can't pile up;
+    - the texts remembered: an LRU of at most `max_texts` entries, each a
+      16-byte key plus a 5-tuple outcome (roughly 250 bytes per entry). A text
+      evicted from it and seen again is simply treated as new.
+    """
+
+    def __init__(self, max_backlog: int = 4096, max_texts: int = 100000):
+        self.max_backlog = max_backlog
+        # Pending entries (outcome None) are at most the backlog; never evict them
+        self.max_texts = max(max_texts, 2 * max_backlog)
+        # key -> (decision, tag, sentiment, sentiment_score, action), None until known
+        self._outcomes: "OrderedDict[bytes, Optional[Tuple]]" = OrderedDict()
+        self._lock = threading.Lock()   # unique() runs in a worker thread
+        self._rows = deque()        # (text, key, first, routed) in upload order, not yet taken
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        normalized = " ".join(text.lower().split())
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def _remember(self, key: bytes) -> bool:
+        """
+        True the first time `key` is seen (or after it was evicted).
+        """
+        with self._lock:
+            if key in self._outcomes:
+                self._outcomes.move_to_end(key)
+                return False
+            self._outcomes[key] = None
+            while len(self._outcomes) > self.max_texts:
+                self._outcomes.popitem(last=False)
+            return True
+
+    def set_outcome(self, key: bytes, outcome: Tuple) -> None:
+        with self._lock:
+            if key in self._outcomes:
+                self._outcomes[key] = outcome
+
+    def outcome(self, key: bytes) -> Optional[Tuple]:
+        with self._lock:
+            return self._outcomes.get(key)
+
+    def unique(self, texts: Iterable[str]) -> Iterator[str]:
+        for text in texts:
+            key = self.key(text)
+            first = self._remember(key)
+            routed = first or len(self._rows) >= self.max_backlog
+            self._rows.append((text, key, first, routed))
+            if routed:
+                yield text
+
+    def windows(
+        self,
+        routed: Iterable[Tuple[str, object]],
+        size: int
+    ) -> Iterator[List[Tuple[str, bytes, bool, Optional[object]]]]:
+        """
+        Consumes the router's (text, result) stream lazily and yields the upload
+        rows in order, in windows of at most `size`, each row as
+        (text, key, first, router result or None).
+        A duplicate only has a result when it was routed to bound the backlog.
+        """
+        window = []
+        for routed_text, result in routed:
+            # Rows up to and including the one this result belongs to
+            while True:
+                text, key, first, was_routed = self._rows.popleft()
+                if was_routed and routed_text != text:
+                    raise RuntimeError("router output out of order with the upload")
+                window.append((text, key, first, result if was_routed else None))
+                if len(window) == size:
+                    yield window
+                    window = []
+                if was_routed:
+                    break
+        # Router exhausted: what is left are duplicates
+        while self._rows:
+            text, key, first, _ = self._rows.popleft()
+            window.append((text, key, first, None))
+            if len(window) == size:
+                yield window
+                window = []
+        if window:
+            yield window
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+# ------------------------------------------------------------------
+# BACKGROUND BATCH JOBS
+# ------------------------------------------------------------------
+# Each job owns a directory: the uploaded CSV plus job.json (status, progress,
+# last checkpoint, final result). job.json is rewritten atomically, so after a
+# crash or restart a job resumes from its last committed row. The upload is
+# deleted once the job finishes; whole finished jobs are pruned by age.
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class BatchJob:
+    def __init__(self, job_dir: str, state: dict):
+        self.dir = job_dir
+        self.state = state
+        self.version = 0
+        self.changed = asyncio.Event()
+        self.done: Optional[asyncio.Future] = None
+        self._run_started = 0.0
+        self._run_start_rows = 0
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    @property
+    def upload_path(self) -> str:
+        return os.path.join(self.dir, "upload.csv")
+
+    @property
+    def options(self) -> dict:
+        return self.state["options"]
+
+    @property
+    def checkpoint(self) -> dict:
+        """
+        {"committed_rows": int, "state": {...runner accumulators...}}
+        """
+        return self.state["checkpoint"]
+
+    def _save(self) -> None:
+        tmp = os.path.join(self.dir, "job.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.dir, "job.json"))
+
+    def _notify(self) -> None:
+        self.version += 1
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def progress(self, **fields) -> None:
+        """
+        In-memory progress update (rows_read, rows_routed, rows_analyzed, errors,
+        bytes_read, bytes_parsed, ...); persisted with the next checkpoint.
+
+        Throughput, percent and ETA count rows processed (rows_routed). The row
+        total is unknown while streaming; it is estimated from the bytes per row
+        parsed so far.
+        """
+        progress = self.state["progress"]
+        progress.update(fields)
+
+        elapsed = time.perf_counter() - self._run_started
+        done = progress.get("rows_routed", self._run_start_rows)
+        rate = (done - self._run_start_rows) / elapsed if elapsed > 0 else 0.0
+        progress["rows_per_sec"] = round(rate, 1)
+
+        bytes_total = progress.get("bytes_total", 0)
+        bytes_parsed, rows_read = progress.get("bytes_parsed", 0), progress.get("rows_read", 0)
+        if bytes_total and bytes_parsed and rows_read:
+            rows_total = max(done, round(rows_read * bytes_total / bytes_parsed))
+            progress["rows_total_estimate"] = rows_total
+            # 100% is reported by the manager once the job has actually finished
+            progress["percent"] = min(99.9, round(100 * done / rows_total, 1)) if rows_total else 0.0
+            if rate > 0:
+                progress["eta_seconds"] = round((rows_total - done) / rate, 1)
+        self._notify()
+
+    async def commit(self, committed_rows: int, state: dict) -> None:
+        """
+        Checkpoint: everything before `committed_rows` is done and persisted.
+        """
+        self.state["checkpoint"] = {"committed_rows": committed_rows, "state": state}
+        self.state["progress"]["rows_committed"] = committed_rows
+        self.state["progress"]["checkpointed_at"] = time.time()
+        await asyncio.to_thread(self._save)
+        self.progress()
+
+    def snapshot(self, include_result: bool = True) -> dict:
+        snap = {k: v for k, v in self.state.items() if k not in ("checkpoint", "result")}
+        if include_result and self.state.get("result") is not None:
+            snap["result"] = self.state["result"]
+        return snap
+
+
+# Runner: does the work, calling job.progress(...) and await job.commit(...)
+# as it goes; returns the final result payload.
+JobRunner = Callable[[BatchJob], Awaitable[dict]]
+
+
+class BatchJobManager:
+    """
+    Runs batch jobs as background tasks, at most `max_concurrent` at a time.
+    """
+
+    def __init__(self, jobs_dir: str, runner: JobRunner, max_concurrent: int = 2):
+        self.jobs_dir = jobs_dir
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.jobs: Dict[str, BatchJob] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self._stopping = False
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    def create(self, upload, filename: str, options: dict) -> BatchJob:
+        """
+        Copies the upload (file object) into a new job directory. Blocking I/O.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, "upload.csv"), "wb") as out:
+            shutil.copyfileobj(upload, out, length=1 << 20)
+
+        job = BatchJob(job_dir, {
+            "id": job_id,
+            "filename": filename,
+            "status": "queued",
+            "options": options,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "resumed": 0,
+            "error": None,
+            "progress": {"bytes_total": os.path.getsize(os.path.join(job_dir, "upload.csv"))},
+            "checkpoint": {"committed_rows": 0, "state": None},
+            "result": None,
+        })
+        job._save()
+        self.jobs[job_id] = job
+        return job
+
+    def start(self, job: BatchJob) -> BatchJob:
+        job.done = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._run(job), name=f"batch-job-{job.id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: BatchJob) -> None:
+        async with self._semaphore():
+            job.state["status"] = "running"
+            job.state["started_at"] = job.state["started_at"] or time.time()
+            job._run_started = time.perf_counter()
+            job._run_start_rows = job.checkpoint["committed_rows"]
+            job.progress()
+            try:
+                result = await self.runner(job)
+                job.state.update(status="completed", result=result, finished_at=time.time())
+                job.state["progress"].update(percent=100.0, eta_seconds=0.0)
+            except asyncio.CancelledError:
+                # Shutdown: leave it "running" on disk so the next start resumes it
+                await asyncio.to_thread(job._save)
+                raise
+            except Exception as e:
+                if self._stopping:
+                    # Interrupted by shutdown (e.g. the router pool went away): resume later
+                    print(f"[BATCH JOB] {job.id} interrupted by shutdown: {e}")
+                    await asyncio.to_thread(job._save)
+                    return
+                print(f"[BATCH JOB] {job.id} failed: {e}")
+                job.state.update(status="failed", error=str(e), finished_at=time.time())
+            await asyncio.to_thread(job._save)
+            # Only needed to resume; the results live in the job directory
+            await asyncio.to_thread(self._remove_upload, job)
+            job._notify()
+            if not job.done.done():
+                job.done.set_result(job.state["status"])
+
+    @staticmethod
+    def _remove_upload(job: BatchJob) -> None:
+        try:
+            os.remove(job.upload_path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_age_seconds: float, keep: Iterable[str] = ()) -> int:
+        """
+        Deletes finished jobs (directory and all) older than `max_age_seconds`,
+        except the ids in `keep`. Blocking I/O.
+        """
+        cutoff = time.time() - max_age_seconds
+        keep = set(keep)
+        pruned = 0
+        for job in list(self.jobs.values()):
+            finished_at = job.state.get("finished_at")
+            if job.state["status"] in ACTIVE_STATUSES or job.id in keep or not finished_at:
+                continue
+            if finished_at < cutoff:
+                shutil.rmtree(job.dir, ignore_errors=True)
+                self.jobs.pop(job.id, None)
+                pruned += 1
+        if pruned:
+            print(f"[BATCH JOB] Pruned {pruned} finished job(s)")
+        return pruned
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[dict]:
+        jobs = sorted(self.jobs.values(), key=lambda j: j.state["created_at"], reverse=True)
+        return [job.snapshot(include_result=False) for job in jobs]
+
+    async def events(self, job_id: str, heartbeat_seconds: float = 15.0):
+        """
+        Async generator of progress snapshots: one immediately, then one per
+        change, until the job finishes. Yields None as a keep-alive.
+        """
+        job = self.jobs[job_id]
+        while True:
+            changed = job.changed
+            yield job.snapshot(include_result=False)
+            if job.state["status"] not in ACTIVE_STATUSES:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield None
+
+    def resume_incomplete(self) -> int:
+        """
+        Loads every job directory and restarts the jobs that never finished.
+        Call from inside the running event loop (startup).
+        """
+        if not os.path.isdir(self.jobs_dir):
+            return 0
+        resumed = 0
+        for job_id in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, job_id, "job.json")
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = BatchJob(os.path.dirname(path), json.load(f))
+            except Exception as e:
+                print(f"[BATCH JOB] Skipping unreadable job {job_id}: {e}")
+                continue
+            self.jobs[job.id] = job
+            if job.state["status"] in ACTIVE_STATUSES:
+                job.state["status"] = "queued"
+                job.state["resumed"] += 1
+                self.start(job)
+                resumed += 1
+                print(f"[BATCH JOB] Resuming {job.id} from row {job.checkpoint['committed_rows']}")
+        return resumed
+
+    async def shutdown(self) -> None:
+        self._stopping = True
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+RESULT_FIELDS = ["id", "text", "tag", "sentiment", "sentiment_score", "action"]
+# Columns the result endpoints can filter on (each one is indexed)
+FILTER_FIELDS = ("tag", "sentiment", "action")
+
+
+class BatchResultStore:
+    """
+    Per-job batch results, one SQLite row per CSV row, keyed by the row's
+    position in the upload. Re-writing a row (e.g. after a resume) replaces it.
+    Reads are keyset-paginated on that position, so a page costs the same at
+    the start and at the end of a big job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                row INTEGER PRIMARY KEY,
+                id TEXT,
+                text TEXT,
+                tag TEXT,
+                sentiment TEXT,
+                sentiment_score INTEGER,
+                action TEXT
+            )
+        """)
+        for field in FILTER_FIELDS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_results_{field} ON results({field}, row)")
+        self._db.commit()
+
+    def add_many(self, rows: List[Tuple[int, dict]]) -> None:
+        """
+        rows: (position in the upload, result dict) pairs; one transaction.
+        """
+        if not rows:
+            return
+        values = [(pos, *(result.get(field) for field in RESULT_FIELDS)) for pos, result in rows]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO results (row, id, text, tag, sentiment, sentiment_score, action) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _where(filters: dict, after: Optional[int]) -> Tuple[str, list]:
+        clauses, params = [], []
+        for field in FILTER_FIELDS:
+            if filters.get(field) is not None:
+                clauses.append(f"{field} = ?")
+                params.append(filters[field])
+        if after is not None:
+            clauses.append("row > ?")
+            params.append(after)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def _select(self, filters: dict, after: Optional[int], limit: int) -> List[dict]:
+        where, params = self._where(filters, after)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT row, {', '.join(RESULT_FIELDS)} FROM results{where} ORDER BY row LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [dict(zip(["row", *RESULT_FIELDS], r)) for r in rows]
+
+    def page(self, cursor: Optional[str] = None, limit: int = 100, **filters) -> dict:
+        """
+        One page of results after `cursor` (opaque; the last row position seen).
+        """
+        after = int(cursor) if cursor else None
+        items = self._select(filters, after, limit + 1)
+        next_cursor = str(items[limit - 1]["row"]) if len(items) > limit else None
+        return {"items": items[:limit], "next_cursor": next_cursor}
+
+    def count(self, **filters) -> int:
+        where, params = self._where(filters, None)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+
+    def iter_rows(self, batch_size: int = 1000, **filters) -> Iterator[dict]:
+        after = None
+        while True:
+            batch = self._select(filters, after, batch_size)
+            if not batch:
+                return
+            yield from batch
+            after = batch[-1]["row"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching for the async API.
+    Concurrent submit() calls are collected for up to `max_wait_ms` (or until
+    `max_batch_size` items are waiting), run as ONE call of `batch_fn` in a worker
+    thread, and each caller's future is resolved with its own result.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 10000,
+        name: str = "batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue = max_queue
+        self._worker: Optional[asyncio.Task] = None
+
+        # Stats
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_seen_batch = 0
+        self._batch_sizes = Counter()
+        self._latencies_ms = deque(maxlen=2000)
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._worker = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        # Fail anything still waiting so callers don't hang
+        while self._queue is not None and not self._queue.empty():
+            _, fut, _ = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"{self.name} stopped"))
+        self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        if not self.running:
+            # Not started (e.g. used outside the app): plain per-item call off the loop
+            return (await asyncio.to_thread(self.batch_fn, [item]))[0]
+
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut, time.perf_counter()))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._process(batch)
+
+    def _run_items_singly(self, items: List[Any]) -> List[Any]:
+        """
+        Per-item fallback after a failed batch: each entry is the item's result,
+        or the exception it raised on its own.
+        """
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append(self.batch_fn([item])[0])
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    async def _process(self, batch):
+        items = [item for item, _, _ in batch]
+        failed = ()
+        try:
+            results = await asyncio.to_thread(self.batch_fn, items)
+        except Exception as e:
+            self.errors += 1
+            if len(batch) == 1:
+                results, failed = [e], {0}
+            else:
+                # Isolate the bad item(s) instead of failing every caller in the batch
+                print(f"[{self.name.upper()}] Batch of {len(batch)} failed ({e}), retrying item by item")
+                results = await asyncio.to_thread(self._run_items_singly, items)
+                failed = {i for i, r in enumerate(results) if isinstance(r, Exception)}
+
+        now = time.perf_counter()
+        for i, ((_, fut, submitted_at), result) in enumerate(zip(batch, results)):
+            self._latencies_ms.append((now - submitted_at) * 1000)
+            if fut.done():
+                continue
+            if i in failed:
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+        self.batches += 1
+        self.items += len(batch)
+        self.max_seen_batch = max(self.max_seen_batch, len(batch))
+        self._batch_sizes[len(batch)] += 1
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies_ms)
+
+        def pct(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 2)
+
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_seen_batch": self.max_seen_batch,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99)},
+        }
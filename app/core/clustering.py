@@ -0,0 +1,140 @@
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.router import encode_texts
+
+# ------------------------------------------------------------------
+# COMPLAINT CLUSTERING (pre-aggregation for the executive report)
+# ------------------------------------------------------------------
+# The LLM gets a handful of cluster summaries (count, share, keywords, exemplars)
+# instead of raw complaints, so the prompt size is fixed however big the window is.
+
+_STOPWORDS = {
+    "about", "after", "again", "also", "because", "been", "before", "being", "could", "does",
+    "doesn't", "dont", "don't", "even", "every", "from", "have", "having", "into", "just",
+    "keeps", "like", "more", "much", "only", "over", "really", "since", "some", "still", "than",
+    "that", "their", "them", "then", "there", "these", "they", "this", "very", "was", "were",
+    "what", "when", "where", "which", "while", "will", "with", "would", "your", "it's", "i've",
+}
+_WORD = re.compile(r"[a-z][a-z'\-]{3,}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def _kmeans_plus_plus(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = [X[rng.integers(len(X))]]
+    closest = 1.0 - X @ centers[0]
+    for _ in range(1, k):
+        weights = np.clip(closest, 0, None) ** 2
+        total = weights.sum()
+        idx = rng.choice(len(X), p=weights / total) if total > 0 else rng.integers(len(X))
+        centers.append(X[idx])
+        closest = np.minimum(closest, 1.0 - X @ X[idx])
+    return np.stack(centers)
+
+
+def _assign(X: np.ndarray, centers: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    return np.concatenate([
+        (X[i:i + chunk] @ centers.T).argmax(axis=1) for i in range(0, len(X), chunk)
+    ])
+
+
+def mini_batch_kmeans(
+    X: np.ndarray,
+    k: int,
+    batch_size: int = 512,
+    iterations: int = 100,
+    seed: int = 0
+):
+    """
+    Spherical mini-batch k-means on L2-normalized rows (cosine similarity).
+    Returns (centers (k, dim), labels (n,)).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    k = max(1, min(k, n))
+
+    init_sample = X[rng.choice(n, min(n, 10 * batch_size), replace=False)]
+    centers = _kmeans_plus_plus(init_sample, k, rng)
+    seen = np.zeros(k, dtype=np.float64)
+
+    for _ in range(iterations):
+        batch = X[rng.choice(n, min(batch_size, n), replace=False)]
+        assign = (batch @ centers.T).argmax(axis=1)
+
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assign, batch)
+        counts = np.bincount(assign, minlength=k).astype(np.float64)
+
+        hit = counts > 0
+        seen[hit] += counts[hit]
+        # Per-center learning rate shrinks as the center sees more points
+        rate = (counts[hit] / seen[hit])[:, None]
+        centers[hit] += rate * (sums[hit] / counts[hit][:, None] - centers[hit])
+        centers = _normalize(centers)
+
+    return centers, _assign(X, centers)
+
+
+def _keywords(texts: List[str], top: int = 5) -> List[str]:
+    counts = Counter()
+    for text in texts:
+        # Count each word once per complaint so one long rant doesn't dominate
+        counts.update({w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS})
+    return [word for word, _ in counts.most_common(top)]
+
+
+def cluster_complaints(
+    texts: List[str],
+    max_clusters: int = 8,
+    exemplars: int = 3,
+    exemplar_chars: int = 200,
+    k: Optional[int] = None
+) -> List[dict]:
+    """
+    Groups complaint texts by meaning and returns compact summaries, largest first:
+    [{"cluster", "count", "share", "keywords", "exemplars"}]
+    """
+    texts = [t for t in texts if t and t.strip()]
+    if not texts:
+        return []
+
+    X = _normalize(encode_texts(texts))
+    if k is None:
+        # ~sqrt(n/2) rule of thumb, capped so the prompt stays small
+        k = min(max_clusters, max(1, int(math.sqrt(len(texts) / 2))))
+    centers, labels = mini_batch_kmeans(X, k)
+
+    summaries = []
+    for c in range(len(centers)):
+        members = np.flatnonzero(labels == c)
+        if len(members) == 0:
+            continue
+        # Exemplars: distinct members closest to the centroid
+        order = members[np.argsort(-(X[members] @ centers[c]))]
+        picked, seen_texts = [], set()
+        for i in order:
+            key = " ".join(texts[i].lower().split())
+            if key in seen_texts:
+                continue
+            seen_texts.add(key)
+            picked.append(texts[i][:exemplar_chars])
+            if len(picked) == exemplars:
+                break
+
+        summaries.append({
+            "count": int(len(members)),
+            "share": round(len(members) / len(texts), 3),
+            "keywords": _keywords([texts[i] for i in members]),
+            "exemplars": picked
+        })
+
+    summaries.sort(key=lambda s: s["count"], reverse=True)
+    return [{"cluster": n, **summary} for n, summary in enumerate(summaries, start=1)]
@@ -0,0 +1,132 @@
+import codecs
+import csv
+import os
+from typing import BinaryIO, Iterator, List, Optional
+
+# Same spellings pandas reads as NaN by default (the old parser turned these into "")
+_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+# The csv module caps a field at 128 KiB by default (pandas has no cap). Raised
+# process-wide; a field still over the cap (e.g. an unterminated quote swallowing
+# the rest of the file) skips its row instead of failing the upload.
+MAX_FIELD_CHARS = int(os.getenv("CSV_MAX_FIELD_CHARS", str(16 << 20)))
+csv.field_size_limit(max(csv.field_size_limit(), MAX_FIELD_CHARS))
+
+
+class CSVStream:
+    """
+    Streams one text column out of an uploaded CSV in constant memory.
+
+    Bytes are read in `chunk_size` pieces and decoded incrementally as UTF-8
+    (BOM stripped); at the first invalid byte the rest of the stream switches to
+    latin-1, which never fails, instead of re-parsing the whole file. Rows are
+    parsed with the csv module as the lines arrive.
+    """
+
+    def __init__(self, raw: BinaryIO, chunk_size: int = 1 << 20):
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.encoding = "utf-8"
+        self.columns: List[str] = []
+        self.text_column: Optional[str] = None
+        self.rows = 0
+        self.skipped_rows = 0
+        self.bytes_read = 0
+        self._chars_decoded = 0
+        self._chars_parsed = 0
+
+    @property
+    def bytes_parsed(self) -> int:
+        """
+        Approximate bytes behind the rows parsed so far. bytes_read runs a whole
+        chunk ahead of the parser, so progress estimates should use this.
+        """
+        if not self._chars_decoded:
+            return 0
+        return round(self.bytes_read * self._chars_parsed / self._chars_decoded)
+
+    def _text_chunks(self) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        first = True
+        while True:
+            data = self.raw.read(self.chunk_size)
+            self.bytes_read += len(data)
+            final = not data
+            if first and data:
+                first = False
+                if data.startswith(codecs.BOM_UTF8):
+                    data = data[len(codecs.BOM_UTF8):]
+
+            if self.encoding == "utf-8":
+                try:
+                    yield decoder.decode(data, final)
+                except UnicodeDecodeError as e:
+                    # e.object is the decoder's buffered bytes + this chunk
+                    self.encoding = "latin1"
+                    print("[BATCH] Invalid UTF-8 in upload; decoding the rest as latin-1")
+                    yield e.object[:e.start].decode("utf-8") + e.object[e.start:].decode("latin1")
+            elif data:
+                yield data.decode("latin1")
+
+            if final:
+                return
+
+    def _lines(self) -> Iterator[str]:
+        pending = ""
+        for text in self._text_chunks():
+            if not text:
+                continue
+            self._chars_decoded += len(text)
+            lines = (pending + text).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                self._chars_parsed += len(line) + 1
+                yield line + "\n"
+        if pending:
+            self._chars_parsed += len(pending)
+            yield pending
+
+    @staticmethod
+    def pick_text_column(columns: List[str]) -> int:
+        for i, c in enumerate(columns):
+            if "text" in c.lower() or "complaint" in c.lower():
+                return i
+        return 0
+
+    def texts(self) -> Iterator[str]:
+        """
+        Yields the stripped text column of every data row ("" for missing values).
+        Blank lines are ignored; rows with more fields than the header, or with a
+        field over MAX_FIELD_CHARS, are skipped.
+        """
+        reader = csv.reader(self._lines())
+        for header in reader:
+            if any(cell.strip() for cell in header):
+                break
+        else:
+            return
+
+        self.columns = [c.strip() for c in header]
+        index = self.pick_text_column(self.columns)
+        self.text_column = self.columns[index]
+
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                self.skipped_rows += 1
+                print(f"[BATCH] Skipping unreadable CSV row near line {reader.line_num}: {e}")
+                continue
+            if not row:
+                continue
+            if len(row) > len(self.columns):
+                self.skipped_rows += 1
+                continue
+            self.rows += 1
+            value = row[index].strip() if index < len(row) else ""
+            yield "" if value in _NA_VALUES else value
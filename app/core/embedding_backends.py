@@ -0,0 +1,95 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+
+import numpy as np
+
+
+# ------------------------------------------------------------------
+# EMBEDDING BACKENDS (Tier 1 inference engines)
+# ------------------------------------------------------------------
+# "torch"      : full fp32 PyTorch MiniLM (original behaviour)
+# "torch-int8" : same weights, Linear layers dynamically quantized to int8 on CPU
+# "onnx-int8"  : int8-quantized ONNX export run by ONNX Runtime
+#                (needs sentence-transformers>=3.2 with the [onnx] extra)
+
+# Quantized ONNX file shipped in the model repo; avx2 runs on any modern x86 CPU
+ONNX_MODEL_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+class EmbeddingBackend(ABC):
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 64, normalize: bool = False) -> np.ndarray:
+        """
+        (len(texts), dim) float32 array, L2-normalized when `normalize` is set.
+        """
+
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], batch_size: int = 64, normalize: bool = False) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+            show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class TorchInt8Backend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, model_name: str):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        EmbeddingBackend.__init__(self, model_name)
+        # Dynamic quantization is CPU-only
+        model = SentenceTransformer(model_name, device="cpu")
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxInt8Backend(TorchBackend):
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str):
+        EmbeddingBackend.__init__(self, model_name)
+        try:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(
+                model_name,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_MODEL_FILE}
+            )
+        except TypeError as e:
+            # Older sentence-transformers has no `backend` argument
+            raise RuntimeError(
+                "onnx-int8 backend needs sentence-transformers>=3.2 "
+                "(pip install 'sentence-transformers[onnx]')"
+            ) from e
+
+
+BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    TorchBackend.name: TorchBackend,
+    TorchInt8Backend.name: TorchInt8Backend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+}
+
+
+def load_backend(name: str, model_name: str) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name)
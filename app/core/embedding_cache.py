@@ -0,0 +1,164 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of text embeddings, keyed by a hash of the normalized text.
+    Optionally backed by a SQLite file so a restarted worker starts warm. The
+    file is bounded too: past `max_disk_entries` (+10% slack, so trims are
+    batched) the oldest-written rows are deleted.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None, namespace: str = "",
+                 max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.namespace = namespace
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0      # upper bound: replaced rows are counted again
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+                # WAL: routing worker processes can read while another one writes
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+                self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._trim_disk()
+            except Exception as e:
+                print(f"[EMBED CACHE] Disk store disabled ({path}): {e}")
+                self._db = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # MiniLM is uncased, so case and whitespace do not change the embedding
+        return " ".join(text.lower().split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.namespace}\x00{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Returns the cached vector for each text, or None on a miss.
+        """
+        keys = [self.key(t) for t in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        with self._lock:
+            disk_lookup = []
+            for i, k in enumerate(keys):
+                vector = self._entries.get(k)
+                if vector is not None:
+                    self._entries.move_to_end(k)
+                    found[i] = vector
+                else:
+                    disk_lookup.append(i)
+
+            if disk_lookup and self._db is not None:
+                wanted = list({keys[i] for i in disk_lookup})
+                stored = {}
+                try:
+                    for start in range(0, len(wanted), 500):
+                        chunk = wanted[start:start + 500]
+                        placeholders = ",".join("?" * len(chunk))
+                        rows = self._db.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                        ).fetchall()
+                        for k, blob in rows:
+                            stored[k] = np.frombuffer(blob, dtype=np.float32)
+                except Exception as e:
+                    # A busy/locked store just means a miss
+                    print(f"[EMBED CACHE] Disk lookup failed: {e}")
+                for i in disk_lookup:
+                    vector = stored.get(keys[i])
+                    if vector is not None:
+                        found[i] = vector
+                        self.disk_hits += 1
+                        self._insert(keys[i], vector)
+
+            hit_count = sum(1 for v in found if v is not None)
+            self.hits += hit_count
+            self.misses += len(texts) - hit_count
+
+        return found
+
+    def put_many(self, texts: List[str], vectors) -> None:
+        keys = [self.key(t) for t in texts]
+        vectors = [np.asarray(v, dtype=np.float32) for v in vectors]
+
+        with self._lock:
+            for k, vector in zip(keys, vectors):
+                self._insert(k, vector)
+
+            if self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(k, v.tobytes()) for k, v in zip(keys, vectors)]
+                    )
+                    self._db.commit()
+                    self._disk_entries += len(keys)
+                    if self._disk_entries > self.max_disk_entries * 1.1:
+                        self._trim_disk()
+                except Exception as e:
+                    print(f"[EMBED CACHE] Failed to persist embeddings: {e}")
+
+    def _trim_disk(self) -> None:
+        """
+        Deletes the oldest-written rows (INSERT OR REPLACE renews the rowid)
+        down to max_disk_entries. Freed pages are reused, so the file stops growing.
+        """
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_entries - self.max_disk_entries
+        if excess <= 0:
+            return
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+            (excess,)
+        )
+        self._db.commit()
+        self._disk_entries -= excess
+
+    def _insert(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_backed": self._db is not None,
+                "disk_entries": self._disk_entries,
+                "max_disk_entries": self.max_disk_entries,
+            }
@@ -0,0 +1,285 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+# Column order of the legacy data/history_log.csv (kept for import/export)
+HISTORY_FIELDS = ["timestamp", "id", "text", "decision", "confidence", "summary", "status"]
+
+_INSERT = (
+    "INSERT INTO history (timestamp, id, text, decision, confidence, summary, status) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_BUMP = (
+    "INSERT INTO history_counters (name, value) VALUES (?, ?) "
+    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value"
+)
+# Dashboard "Critical" card: the word anywhere in the row
+CRITICAL_NEEDLE = "critical"
+
+
+class HistoryStore:
+    """
+    Analysis history in SQLite (WAL). Replaces the append-only history_log.csv:
+    rows are inserted with one prepared statement and read back with indexed
+    queries instead of re-parsing the whole file.
+
+    Dashboard aggregates (total, per decision, per status, critical) are kept
+    in history_counters, updated in the same transaction as each insert and
+    mirrored in memory, so reading them is O(1).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Writes arrive in groups (see history_writer), so a WAL fsync per commit is cheap
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                id TEXT,
+                text TEXT,
+                decision TEXT,
+                confidence REAL,
+                summary TEXT,
+                status TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_decision ON history(decision)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_status ON history(status)")
+        # Not unique: /analyze callers and legacy CSVs may reuse ids
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_id ON history(id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS history_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._counters = dict(self._db.execute("SELECT name, value FROM history_counters").fetchall())
+
+    @staticmethod
+    def _values(row: dict) -> tuple:
+        return tuple(row.get(field) for field in HISTORY_FIELDS)
+
+    # --- WRITES ---
+    def append(self, row: dict) -> None:
+        self.append_many([row])
+
+    @staticmethod
+    def _row_counters(values: tuple, deltas: dict) -> None:
+        row = dict(zip(HISTORY_FIELDS, values))
+        deltas["total"] = deltas.get("total", 0) + 1
+        for name in (f"decision:{row['decision']}", f"status:{row['status']}"):
+            deltas[name] = deltas.get(name, 0) + 1
+        if any(CRITICAL_NEEDLE in str(v).lower() for v in values if v is not None):
+            deltas["critical"] = deltas.get("critical", 0) + 1
+
+    def append_many(self, rows: Iterable[dict]) -> int:
+        values = [self._values(row) for row in rows]
+        if not values:
+            return 0
+        deltas = {}
+        for row_values in values:
+            self._row_counters(row_values, deltas)
+        with self._lock:
+            self._db.executemany(_INSERT, values)
+            self._db.executemany(_BUMP, list(deltas.items()))
+            self._db.commit()
+            for name, delta in deltas.items():
+                self._counters[name] = self._counters.get(name, 0) + delta
+        return len(values)
+
+    # --- COUNTERS ---
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def bump(self, name: str, delta: int = 1) -> None:
+        """
+        Adjusts a counter that is not derived from history rows (e.g. pending reviews).
+        """
+        with self._lock:
+            self._db.execute(_BUMP, (name, delta))
+            self._db.commit()
+            self._counters[name] = self._counters.get(name, 0) + delta
+
+    def set_counter(self, name: str, value: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO history_counters (name, value) VALUES (?, ?)", (name, value)
+            )
+            self._db.commit()
+            self._counters[name] = value
+
+    def rebuild_counters(self) -> dict:
+        """
+        Recomputes the history-derived counters from the table (one pass per
+        aggregate). Counters set with bump/set_counter are kept.
+        """
+        with self._lock:
+            db = self._db
+            rebuilt = {"total": db.execute("SELECT COUNT(*) FROM history").fetchone()[0]}
+            for column in ("decision", "status"):
+                for key, n in db.execute(f"SELECT {column}, COUNT(*) FROM history GROUP BY {column}"):
+                    rebuilt[f"{column}:{key}"] = n
+            rebuilt["critical"] = self._count_matching_locked(CRITICAL_NEEDLE)
+
+            derived = [name for name in self._counters
+                       if name in ("total", "critical") or name.startswith(("decision:", "status:"))]
+            db.executemany("DELETE FROM history_counters WHERE name = ?", [(n,) for n in derived])
+            db.executemany(
+                "INSERT INTO history_counters (name, value) VALUES (?, ?)", list(rebuilt.items())
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO history_meta (key, value) VALUES ('counters_ready', '1')"
+            )
+            db.commit()
+            for name in derived:
+                self._counters.pop(name, None)
+            self._counters.update(rebuilt)
+        print(f"[HISTORY] Rebuilt counters over {rebuilt['total']} rows")
+        return rebuilt
+
+    def ensure_counters(self, force: bool = False) -> None:
+        """
+        Startup check: rebuilds the counters if they were never built (a store
+        created before they existed) or no longer match the row count.
+        """
+        with self._lock:
+            ready = self._db.execute(
+                "SELECT 1 FROM history_meta WHERE key = 'counters_ready'"
+            ).fetchone()
+            rows = self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            consistent = self._counters.get("total", 0) == rows
+        if force or not ready or not consistent:
+            self.rebuild_counters()
+
+    def import_csv(self, csv_path: str, chunk_size: int = 5000) -> int:
+        """
+        One-shot import of a legacy history CSV. Recorded in history_meta, so
+        calling it again (e.g. on every startup) is a no-op.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        marker = f"imported:{os.path.abspath(csv_path)}"
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM history_meta WHERE key = ?", (marker,)).fetchone():
+                return 0
+
+        imported = 0
+        with open(csv_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                chunk.append({k.strip().lower(): v for k, v in row.items() if k})
+                if len(chunk) >= chunk_size:
+                    imported += self.append_many(chunk)
+                    chunk = []
+            imported += self.append_many(chunk)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO history_meta (key, value) VALUES (?, ?)", (marker, str(imported))
+            )
+            self._db.commit()
+        print(f"[HISTORY] Imported {imported} rows from {csv_path}")
+        return imported
+
+    # --- READS ---
+    def _count_matching_locked(self, needle: str) -> int:
+        """
+        Rows mentioning `needle` in any column (case-insensitive); caller holds
+        the lock. Not indexable, so only the counter rebuild uses it.
+        """
+        pattern = f"%{needle}%"
+        return self._db.execute(
+            "SELECT COUNT(*) FROM history WHERE text LIKE ? OR summary LIKE ? "
+            "OR decision LIKE ? OR status LIKE ? OR id LIKE ? OR timestamp LIKE ?",
+            (pattern,) * 6
+        ).fetchone()[0]
+
+    def recent_texts(self, limit: int, exclude_decision: Optional[str] = None) -> List[str]:
+        """
+        Non-empty texts of the last `limit` rows (oldest first), optionally
+        dropping one decision.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT text, decision FROM history ORDER BY seq DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [
+            text for text, decision in reversed(rows)
+            if text and (exclude_decision is None or decision != exclude_decision)
+        ]
+
+    def existing_ids(self, ids: List[str]) -> set:
+        """
+        The subset of `ids` that already has a history row.
+        """
+        found = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                found.update(row[0] for row in self._db.execute(
+                    f"SELECT DISTINCT id FROM history WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def watermark(self) -> list:
+        """
+        [last seq]: rows are only ever appended and AUTOINCREMENT never reuses a
+        seq, so this changes whenever a row is added. One primary-key lookup.
+        """
+        with self._lock:
+            return list(self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM history").fetchone())
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        All rows in insertion order, fetched in keyset-paginated batches.
+        """
+        last = 0
+        columns = ", ".join(HISTORY_FIELDS)
+        while True:
+            with self._lock:
+                batch = self._db.execute(
+                    f"SELECT seq, {columns} FROM history WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (last, batch_size)
+                ).fetchall()
+            if not batch:
+                return
+            for row in batch:
+                yield dict(zip(HISTORY_FIELDS, row[1:]))
+            last = batch[-1][0]
+
+    def export_csv(self, out) -> int:
+        """
+        Writes the history in the legacy CSV layout to a text file object.
+        """
+        writer = csv.DictWriter(out, fieldnames=HISTORY_FIELDS)
+        writer.writeheader()
+        n = 0
+        for row in self.iter_rows():
+            writer.writerow(row)
+            n += 1
+        return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import/export the SQLite analysis history.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("csv_path", help="CSV file to import from / export to")
+    parser.add_argument("--db", default=os.getenv("HISTORY_DB_PATH", "data/history.sqlite"))
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.command == "import":
+        print(f"Imported {store.import_csv(args.csv_path)} rows into {args.db}")
+    else:
+        with open(args.csv_path, "w", newline="", encoding="utf-8") as f:
+            print(f"Exported {store.export_csv(f)} rows to {args.csv_path}")
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+
+class HistoryWriter:
+    """
+    Write-behind logger for history rows.
+    submit() only enqueues (bounded queue); a background task drains the queue
+    in groups of up to `group_size` rows or every `flush_interval_ms`, and
+    writes each group with ONE call of `write_fn` (one transaction, one fsync)
+    in a worker thread. When the queue is full, submit() waits: backpressure
+    instead of unbounded memory.
+    """
+
+    def __init__(
+        self,
+        write_fn: Callable[[List[dict]], int],
+        group_size: int = 500,
+        flush_interval_ms: float = 200.0,
+        max_queue: int = 20000,
+        name: str = "history-writer"
+    ):
+        self.write_fn = write_fn
+        self.group_size = group_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue = max_queue
+        self._worker: Optional[asyncio.Task] = None
+        # Serializes group writes between the worker and flush()
+        self._write_lock: Optional[asyncio.Lock] = None
+        # Rows the worker has dequeued but not written yet (flushed on stop)
+        self._pending: List[dict] = []
+        # The worker's group write in progress (flush/stop wait for it)
+        self._inflight: Optional[asyncio.Future] = None
+
+        # Stats
+        self.groups = 0
+        self.rows = 0
+        self.errors = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+        self.max_seen_group = 0
+        self.last_write_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        self._write_lock = asyncio.Lock()
+        self._worker = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        """
+        Stops the worker and writes everything still queued.
+        """
+        if not self.running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        await self.flush()
+
+    async def submit(self, row: dict) -> None:
+        if not self.running:
+            # Not started (e.g. used outside the app): write through, off the loop
+            await asyncio.to_thread(self.write_fn, [row])
+            return
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(row)
+
+    async def flush(self) -> None:
+        """
+        Writes whatever is queued right now (e.g. before reading the store back),
+        after the worker's group write in progress, if any, has finished.
+        """
+        if self._queue is None:
+            return
+        # Loop: while we write, the worker may move more queued rows into _pending
+        while True:
+            if self._inflight is not None and not self._inflight.done():
+                await asyncio.shield(self._inflight)
+                continue
+            group, self._pending = self._pending, []
+            while len(group) < self.group_size and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+            if not group:
+                return
+            await self._write(group)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Await first, then append: flush() may swap _pending in the meantime
+            row = await self._queue.get()
+            self._pending.append(row)
+            deadline = loop.time() + self.flush_interval
+
+            while len(self._pending) < self.group_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                self._pending.append(row)
+
+            group, self._pending = self._pending, []
+            # Shielded: a shutdown mid-write must not lose the group
+            self._inflight = asyncio.ensure_future(self._write(group))
+            await asyncio.shield(self._inflight)
+
+    async def _write(self, group: List[dict]) -> None:
+        if not group:
+            return
+        async with self._write_lock:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.write_fn, group)
+            except Exception as e:
+                self.errors += 1
+                self.dropped += len(group)
+                print(f"[HISTORY] Group write of {len(group)} rows failed: {e}")
+                return
+            self.last_write_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.groups += 1
+            self.rows += len(group)
+            self.max_seen_group = max(self.max_seen_group, len(group))
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self._max_queue,
+            "group_size": self.group_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "groups": self.groups,
+            "rows": self.rows,
+            "avg_group_size": round(self.rows / self.groups, 2) if self.groups else 0.0,
+            "max_seen_group": self.max_seen_group,
+            "last_write_ms": self.last_write_ms,
+            "backpressure_waits": self.backpressure_waits,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
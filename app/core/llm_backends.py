@@ -0,0 +1,428 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional, Type
+
+
+class LLMResponse(NamedTuple):
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+# ------------------------------------------------------------------
+# BACKENDS
+# ------------------------------------------------------------------
+# "groq"          : Groq cloud (production)
+# "stub"          : deterministic local responses, no network (load tests, CI)
+# "openai-compat" : any OpenAI-compatible /chat/completions server (vLLM, llama.cpp, ...)
+
+# Transport timeout of every backend request. The async callers also enforce their
+# own (shorter) per-call timeouts; the sync path (executive report) relies on this one.
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+
+class LLMBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    def complete(self, model: str, messages: List[dict], temperature: float = 0,
+                 response_format: Optional[dict] = None) -> LLMResponse:
+        """One chat completion, blocking."""
+
+    @abstractmethod
+    async def acomplete(self, model: str, messages: List[dict], temperature: float = 0,
+                        response_format: Optional[dict] = None) -> LLMResponse:
+        """One chat completion, non-blocking."""
+
+
+def _from_openai_completion(completion) -> LLMResponse:
+    usage = getattr(completion, "usage", None)
+    return LLMResponse(
+        content=completion.choices[0].message.content,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0
+    )
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+
+    def __init__(self):
+        from groq import Groq, AsyncGroq
+        api_key = os.getenv("GROQ_API_KEY")
+        # The SDK refuses to construct a client without a key; with a placeholder the app
+        # still starts and each call fails (and is logged) instead.
+        self.client = Groq(api_key=api_key or "missing-key", max_retries=0,
+                           timeout=LLM_HTTP_TIMEOUT_SECONDS)
+        self.async_client = AsyncGroq(api_key=api_key or "missing-key", max_retries=0,
+                                      timeout=LLM_HTTP_TIMEOUT_SECONDS)
+
+    def complete(self, model, messages, temperature=0, response_format=None):
+        kwargs = {"response_format": response_format} if response_format else {}
+        completion = self.client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **kwargs
+        )
+        return _from_openai_completion(completion)
+
+    async def acomplete(self, model, messages, temperature=0, response_format=None):
+        kwargs = {"response_format": response_format} if response_format else {}
+        completion = await self.async_client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **kwargs
+        )
+        return _from_openai_completion(completion)
+
+
+class OpenAICompatBackend(LLMBackend):
+    name = "openai-compat"
+
+    def __init__(self):
+        import httpx
+        self.base_url = os.getenv("LLM_BASE_URL", "http://localhost:8080/v1").rstrip("/")
+        headers = {}
+        if os.getenv("LLM_API_KEY"):
+            headers["Authorization"] = f"Bearer {os.getenv('LLM_API_KEY')}"
+        self.client = httpx.Client(base_url=self.base_url, headers=headers,
+                                   timeout=LLM_HTTP_TIMEOUT_SECONDS)
+        self.async_client = httpx.AsyncClient(base_url=self.base_url, headers=headers,
+                                              timeout=LLM_HTTP_TIMEOUT_SECONDS)
+
+    @staticmethod
+    def _body(model, messages, temperature, response_format):
+        body = {"model": model, "messages": messages, "temperature": temperature}
+        if response_format:
+            body["response_format"] = response_format
+        return body
+
+    @staticmethod
+    def _parse(response) -> LLMResponse:
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage") or {}
+        return LLMResponse(
+            content=data["choices"][0]["message"]["content"],
+            prompt_tokens=usage.get("prompt_tokens", 0) or 0,
+            completion_tokens=usage.get("completion_tokens", 0) or 0
+        )
+
+    def complete(self, model, messages, temperature=0, response_format=None):
+        response = self.client.post(
+            "/chat/completions", json=self._body(model, messages, temperature, response_format)
+        )
+        return self._parse(response)
+
+    async def acomplete(self, model, messages, temperature=0, response_format=None):
+        response = await self.async_client.post(
+            "/chat/completions", json=self._body(model, messages, temperature, response_format)
+        )
+        return self._parse(response)
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline stand-in: same input -> same JSON, shaped like the
+    real prompts expect. LLM_STUB_LATENCY_MS simulates provider latency.
+    """
+    name = "stub"
+
+    DEVICES = ["Phone", "Laptop", "Headphones", "Smartwatch", "Tablet", "Speaker"]
+    DEFECTS = ["Battery Drain", "Overheating", "Bluetooth Pairing", "Dead Pixel", "Charging Port", "Software Crash"]
+    SEVERITIES = ["Low", "Medium", "High"]
+    SARCASM_CUES = ["great job", "perfect.", "thanks a lot", "just what i needed", "love how"]
+
+    def __init__(self):
+        self.latency = float(os.getenv("LLM_STUB_LATENCY_MS", "0")) / 1000.0
+
+    @staticmethod
+    def _seed(text: str) -> int:
+        return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+    def _analysis(self, complaint_id: str, text: str) -> dict:
+        lowered = text.lower()
+        if any(cue in lowered for cue in self.SARCASM_CUES):
+            return {
+                "complaint_id": complaint_id,
+                "status": "Review_Queue",
+                "flag_reason": "Possible sarcasm (stub)",
+                "aspects": [],
+                "summary": "Flagged for human review."
+            }
+        seed = self._seed(lowered)
+        device = next((d for d in self.DEVICES if d.lower() in lowered), self.DEVICES[seed % len(self.DEVICES)])
+        defect = self.DEFECTS[(seed // 7) % len(self.DEFECTS)]
+        severity = self.SEVERITIES[(seed // 49) % len(self.SEVERITIES)]
+        return {
+            "complaint_id": complaint_id,
+            "status": "Success",
+            "flag_reason": None,
+            "aspects": [
+                {"aspect": f"Device: {device}", "sentiment": "Negative", "severity": severity},
+                {"aspect": f"Issue: {defect}", "sentiment": "Negative", "severity": severity}
+            ],
+            "summary": f"{device} reported with {defect.lower()} (stub analysis)."
+        }
+
+    def _respond(self, messages: List[dict]) -> LLMResponse:
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+
+        if "BATCH MODE" in system:
+            items = json.loads(user)
+            payload = {"results": [self._analysis(i["complaint_id"], i["text"]) for i in items]}
+        elif user.startswith("Complaint ID:"):
+            header, _, text = user.partition("\nText: ")
+            payload = self._analysis(header.replace("Complaint ID:", "").strip(), text)
+        else:
+            payload = {
+                "top_issues": [
+                    {"issue": "Battery Drain", "count": 0, "severity": "High"},
+                    {"issue": "Overheating", "count": 0, "severity": "Medium"},
+                    {"issue": "Bluetooth Pairing", "count": 0, "severity": "Low"}
+                ],
+                "remediation_steps": [
+                    "Review recent firmware changes affecting power management (stub)",
+                    "Audit thermal design on affected models (stub)",
+                    "Publish a pairing troubleshooting guide (stub)"
+                ]
+            }
+
+        content = json.dumps(payload)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        return LLMResponse(content, prompt_tokens=prompt_chars // 4, completion_tokens=len(content) // 4)
+
+    def complete(self, model, messages, temperature=0, response_format=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def acomplete(self, model, messages, temperature=0, response_format=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+
+BACKENDS: Dict[str, Type[LLMBackend]] = {
+    GroqBackend.name: GroqBackend,
+    StubBackend.name: StubBackend,
+    OpenAICompatBackend.name: OpenAICompatBackend,
+}
+
+
+def load_llm_backend(name: str) -> LLMBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+# ------------------------------------------------------------------
+# RESILIENCE (rate limiter, retries, circuit breaker)
+# ------------------------------------------------------------------
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average with bursts up to `burst`.
+    reserve() books a slot and returns how long the caller must wait for it.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    closed -> (failure_threshold consecutive failures) -> open
+    open   -> (reset_timeout elapsed) -> half_open: one trial call
+    half_open -> success: closed / failure: open again
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+            }
+
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    code = getattr(e, "status_code", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(e: Exception) -> bool:
+    """
+    Throttling, provider-side errors, timeouts and dropped connections are worth
+    retrying; bad requests and unparseable output are not.
+    """
+    code = _status_code(e)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    name = type(e).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after(e: Exception) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ResilientLLM:
+    """
+    Wraps a backend with a token-bucket rate limiter, jittered exponential
+    backoff on retryable errors and a circuit breaker. While the breaker is open,
+    calls raise CircuitOpenError immediately instead of queueing behind a failing
+    provider.
+    """
+
+    def __init__(self, backend: LLMBackend, rate_per_sec: float, burst: int, max_retries: int,
+                 backoff_base: float, backoff_max: float, breaker_failures: int, breaker_reset: float):
+        self.backend = backend
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.rejected = 0
+
+    def _backoff(self, attempt: int, e: Exception) -> float:
+        # "Full jitter": uniform in [0, base * 2^attempt], never below Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, _retry_after(e))
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"LLM circuit open ({self.backend.name})")
+
+    def complete(self, **request) -> LLMResponse:
+        attempt = 0
+        while True:
+            self._check_breaker()
+            self.bucket.acquire()
+            try:
+                response = self.backend.complete(**request)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered (e.g. 400): it is up, just not for this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                time.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    async def acomplete(self, timeout: Optional[float] = None, **request) -> LLMResponse:
+        attempt = 0
+        while True:
+            self._check_breaker()
+            await self.bucket.acquire_async()
+            try:
+                call = self.backend.acomplete(**request)
+                response = await (asyncio.wait_for(call, timeout) if timeout else call)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered (e.g. 400): it is up, just not for this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "rate_per_sec": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "retries": self.retries,
+            "rejected_by_breaker": self.rejected,
+            "breaker": self.breaker.stats(),
+        }
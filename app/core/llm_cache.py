@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class LLMCache:
+    """
+    Disk-backed (SQLite) cache of LLM JSON responses.
+    Keyed by hash(model, prompt version, normalized text). Entries expire after
+    `ttl_seconds`; past `max_entries` the least recently used rows are evicted.
+    """
+
+    # Eviction runs every N writes rather than on every write
+    EVICT_EVERY = 100
+    # Hits only bump last_access in memory; written out every N touches (and before eviction)
+    TOUCH_FLUSH_EVERY = 256
+    # Keys per SELECT ... IN (...) (SQLite caps bound parameters)
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._touched: Dict[str, float] = {}   # key -> last access not yet written
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+        self._db.commit()
+        # Row count, kept up to date by put/evict/clear instead of COUNT(*) on each eviction
+        self._entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def key(self, model: str, prompt_version: str, text: str) -> str:
+        raw = f"{model}\x00{prompt_version}\x00{self.normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """
+        Looks up several keys at once; returns {key: value} for the live hits.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self.LOOKUP_CHUNK):
+                chunk = keys[i:i + self.LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, value, created_at FROM llm_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if now - created_at <= self.ttl_seconds:
+                        found[key] = json.loads(value)
+                        self._touched[key] = now
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if len(self._touched) >= self.TOUCH_FLUSH_EVERY:
+                self._flush_touched()
+                self._db.commit()
+        return found
+
+    def put(self, key: str, value: dict) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, entries: List[Tuple[str, dict]]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        keys = list(dict.fromkeys(key for key, _ in entries))
+        with self._lock:
+            replaced = 0
+            for i in range(0, len(keys), self.LOOKUP_CHUNK):
+                chunk = keys[i:i + self.LOOKUP_CHUNK]
+                replaced += self._db.execute(
+                    f"SELECT COUNT(*) FROM llm_cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchone()[0]
+            self._db.executemany(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), now, now) for key, value in entries]
+            )
+            self._db.commit()
+            self._entries += len(keys) - replaced
+            before = self._writes
+            self._writes += len(entries)
+            if self._writes // self.EVICT_EVERY != before // self.EVICT_EVERY:
+                self._evict(now)
+
+    def _flush_touched(self) -> None:
+        # Caller holds the lock and commits
+        if self._touched:
+            self._db.executemany(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float) -> None:
+        self._flush_touched()
+        cur = self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.evictions += cur.rowcount
+        self._entries -= cur.rowcount
+
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            cur = self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += cur.rowcount
+            self._entries -= cur.rowcount
+        self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+            self._touched.clear()
+            self._entries = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -1,7 +1,15 @@
 import os
-from groq import Groq
+import asyncio
+import hashlib
 import json
+import time
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
+from app.core.llm_backends import (
+    CircuitOpenError, LLMResponse, ResilientLLM, is_retryable, load_llm_backend
+)
+from app.core.llm_cache import LLMCache
+from app.core.llm_metrics import LLMMetrics
 from app.core.schemas import DetailedAnalysis
 
 # Load API Key from .env file
@@ -9,17 +17,28 @@ load_dotenv()
 # This tells Python to look for "GROQ_API_KEY" in the .env file
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-client = Groq(api_key="GROQ_API_KEY")
+# groq | stub | openai-compat (see app/core/llm_backends.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+ANALYSIS_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 
-# ... (Keep imports and generate_executive_report) ...
+# Rate limiter + retries + circuit breaker around whichever backend is configured
+llm = ResilientLLM(
+    load_llm_backend(LLM_BACKEND),
+    rate_per_sec=float(os.getenv("LLM_RATE_PER_SEC", "5")),
+    burst=int(os.getenv("LLM_RATE_BURST", "10")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    backoff_base=float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5")),
+    backoff_max=float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20")),
+    breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    breaker_reset=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+)
 
-def analyze_complex_complaint(text: str, complaint_id: str) -> DetailedAnalysis:
-    """
-    Tier 1b: Performs ABSA *AND* Sarcasm Detection.
-    """
-    
-    # NEW PROMPT: The "Electronics Expert" Logic
-    system_prompt = """
+# Async fan-out limits (Tier 2 batch + /analyze)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# NEW PROMPT: The "Electronics Expert" Logic
+ANALYSIS_SYSTEM_PROMPT = """
     You are a Senior Technical Support AI for a Consumer Electronics Retailer.
     Analyze the customer complaint.
 
@@ -46,46 +65,368 @@ def analyze_complex_complaint(text: str, complaint_id: str) -> DetailedAnalysis:
     }
     """
 
+
+# Cache key component: changes automatically whenever the prompt text is edited
+ANALYSIS_PROMPT_VERSION = "v1-" + hashlib.sha1(ANALYSIS_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:8]
+
+# --- RESPONSE CACHE (temperature=0 -> same text, same analysis) ---
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+llm_cache = LLMCache(
+    path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite"),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+)
+
+
+# --- CALL METRICS (latency, tokens, cost per endpoint) ---
+# Defaults: Groq list price for llama-3.3-70b-versatile, USD per million tokens
+llm_metrics = LLMMetrics(
+    window=int(os.getenv("LLM_METRICS_WINDOW", "2000")),
+    price_input_per_mtok=float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.59")),
+    price_output_per_mtok=float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "0.79"))
+)
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def _cache_key(text: str) -> str:
+    return llm_cache.key(ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION, text)
+
+
+async def _cached_analyses(
+    items: List[Tuple[str, str]],
+    use_cache: bool
+) -> List[Optional[DetailedAnalysis]]:
+    """
+    Cache lookups for a whole list of (text, complaint_id) in one query, off the event loop.
+    """
+    if not (items and use_cache and LLM_CACHE_ENABLED):
+        return [None] * len(items)
+    keys = [_cache_key(text) for text, _ in items]
+    try:
+        found = await asyncio.to_thread(llm_cache.get_many, keys)
+    except Exception as e:
+        print(f"[LLM CACHE] Lookup failed: {e}")
+        return [None] * len(items)
+
+    results = []
+    for key, (_, complaint_id) in zip(keys, items):
+        data = found.get(key)
+        if data is None:
+            results.append(None)
+            continue
+        llm_metrics.record_cache_hit("analysis")
+        # Copy: a text repeated in the list shares one decoded value
+        results.append(DetailedAnalysis(**{**data, "complaint_id": complaint_id}))
+    return results
+
+
+async def _store_analyses(entries: List[Tuple[str, DetailedAnalysis]], use_cache: bool) -> None:
+    if not (entries and use_cache and LLM_CACHE_ENABLED):
+        return
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Complaint ID: {complaint_id}\nText: {text}"}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
+        await asyncio.to_thread(
+            llm_cache.put_many, [(_cache_key(text), analysis.dict()) for text, analysis in entries]
         )
-        
-        raw_json = completion.choices[0].message.content
-        data = json.loads(raw_json)
-        
-        # Pydantic validation handles the structure
-        return DetailedAnalysis(**data)
+    except Exception as e:
+        print(f"[LLM CACHE] Store failed: {e}")
+
+
+def _analysis_request(text: str, complaint_id: str) -> dict:
+    return {
+        "model": ANALYSIS_MODEL,
+        "messages": [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Complaint ID: {complaint_id}\nText: {text}"}
+        ],
+        "temperature": 0,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def _deferred_analysis(complaint_id: str, reason: str) -> DetailedAnalysis:
+    """
+    Returned instead of None when the provider is throttling or down, so the
+    row is kept and can be retried later rather than silently dropped.
+    """
+    return DetailedAnalysis(
+        complaint_id=complaint_id,
+        status="Deferred",
+        flag_reason=reason,
+        summary="Analysis deferred: LLM provider unavailable. Retry later."
+    )
+
 
+def _failed_analysis(complaint_id: str, e: Exception) -> Optional[DetailedAnalysis]:
+    print(f"LLM Error: {e}")
+    if isinstance(e, CircuitOpenError):
+        return _deferred_analysis(complaint_id, "LLM circuit open")
+    if is_retryable(e):
+        return _deferred_analysis(complaint_id, f"LLM unavailable after retries: {type(e).__name__}")
+    return None
+
+
+def _parse_analysis(raw_json: str) -> DetailedAnalysis:
+    data = json.loads(raw_json)
+    # Pydantic validation handles the structure
+    return DetailedAnalysis(**data)
+
+
+def _record_failure(endpoint: str, start: float, e: Exception,
+                    response: Optional[LLMResponse] = None, items: int = 1) -> None:
+    if isinstance(e, CircuitOpenError):
+        llm_metrics.record_rejected(endpoint, items)
+        return
+    llm_metrics.record(
+        endpoint, ANALYSIS_MODEL, _elapsed_ms(start), response,
+        outcome="error" if response is None else "parse_failure", items=items
+    )
+
+
+async def _finish_analysis(
+    text: str,
+    complaint_id: str,
+    response,
+    latency_ms: float,
+    use_cache: bool
+) -> Optional[DetailedAnalysis]:
+    try:
+        analysis = _parse_analysis(response.content)
     except Exception as e:
-        print(f"LLM Error: {e}")
-        return None
-    
+        llm_metrics.record("analysis", ANALYSIS_MODEL, latency_ms, response, outcome="parse_failure")
+        return _failed_analysis(complaint_id, e)
+
+    llm_metrics.record("analysis", ANALYSIS_MODEL, latency_ms, response)
+    await _store_analyses([(text, analysis)], use_cache)
+    return analysis
+
+
+# --- ASYNC TIER 2 (bounded fan-out) ---
+_llm_semaphore: Optional[asyncio.Semaphore] = None
 
 
-# ... (Keep existing imports and analyze_complex_complaint function above) ...
+def _get_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+async def analyze_complex_complaint_async(
+    text: str,
+    complaint_id: str,
+    use_cache: bool = True
+) -> Optional[DetailedAnalysis]:
+    """
+    Tier 1b: Performs ABSA *AND* Sarcasm Detection, non-blocking. At most
+    LLM_MAX_CONCURRENCY calls are in flight; each attempt is abandoned after
+    LLM_TIMEOUT_SECONDS. use_cache=False bypasses the response cache (no read, no write).
+    """
+    cached = (await _cached_analyses([(text, complaint_id)], use_cache))[0]
+    if cached is not None:
+        return cached
+    return await _analyze_uncached(text, complaint_id, use_cache)
+
+
+async def _analyze_uncached(text: str, complaint_id: str, use_cache: bool) -> Optional[DetailedAnalysis]:
+    # The LLM call behind analyze_complex_complaint_async, for callers that already checked the cache
+    try:
+        async with _get_semaphore():
+            # Timed inside the semaphore: queueing behind other calls is not LLM latency
+            start = time.perf_counter()
+            response = await llm.acomplete(
+                timeout=LLM_TIMEOUT_SECONDS, **_analysis_request(text, complaint_id)
+            )
+    except Exception as e:
+        _record_failure("analysis", start, e)
+        return _failed_analysis(complaint_id, e)
+
+    return await _finish_analysis(text, complaint_id, response, _elapsed_ms(start), use_cache)
+
+
+async def analyze_complex_batch(
+    items: List[Tuple[str, str]],
+    use_cache: bool = True,
+    packed: bool = False
+) -> List[Optional[DetailedAnalysis]]:
+    """
+    Analyzes (text, complaint_id) pairs concurrently. Results are in input order.
+    packed=True sends several complaints per request (see analyze_complex_packed).
+    """
+    if packed:
+        return await analyze_complex_packed(items, use_cache)
+    results = await _cached_analyses(items, use_cache)
+    misses = [pos for pos, cached in enumerate(results) if cached is None]
+    analyses = await asyncio.gather(
+        *(_analyze_uncached(items[pos][0], items[pos][1], use_cache) for pos in misses)
+    )
+    for pos, analysis in zip(misses, analyses):
+        results[pos] = analysis
+    return results
+
+
+# --- PACKED TIER 2 (several complaints per request) ---
+# The long system prompt is sent once per pack instead of once per complaint.
+PACKED_SYSTEM_PROMPT = ANALYSIS_SYSTEM_PROMPT + """
+    BATCH MODE:
+    The user message is a JSON array of complaints: [{"complaint_id": "...", "text": "..."}].
+    Analyze EACH complaint independently with the rules above.
+    Return ONE JSON object: {"results": [ <one object in the OUTPUT JSON FORMAT per complaint> ]}
+    Every input complaint_id must appear exactly once in "results".
+    """
+
+# Rough per-pack token budget (complaint text in + analysis out); ~4 chars per token
+LLM_PACK_TOKEN_BUDGET = int(os.getenv("LLM_PACK_TOKEN_BUDGET", "4000"))
+LLM_PACK_MAX_ITEMS = int(os.getenv("LLM_PACK_MAX_ITEMS", "20"))
+LLM_PACK_TIMEOUT_SECONDS = float(os.getenv("LLM_PACK_TIMEOUT_SECONDS", "90"))
+_PACK_ITEM_OVERHEAD_TOKENS = 20
+_PACK_OUTPUT_TOKENS_PER_ITEM = 150
+
+PACK_STATS = {"packs": 0, "packed_items": 0, "fallback_items": 0, "pack_errors": 0}
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _build_packs(items: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+    """
+    Greedily groups (position, text) items so each pack fits the token budget.
+    An item bigger than the whole budget gets a pack of its own.
+    """
+    packs, current, used = [], [], 0
+    for pos, text in items:
+        cost = _estimate_tokens(text) + _PACK_ITEM_OVERHEAD_TOKENS + _PACK_OUTPUT_TOKENS_PER_ITEM
+        if current and (used + cost > LLM_PACK_TOKEN_BUDGET or len(current) >= LLM_PACK_MAX_ITEMS):
+            packs.append(current)
+            current, used = [], 0
+        current.append((pos, text))
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+async def _run_pack(pack: List[Tuple[int, str]]) -> dict:
+    """
+    One request for the whole pack. Returns {position: DetailedAnalysis} for the
+    items that came back valid; anything missing is retried by the caller.
+    """
+    # Pack-local ids: batch complaint ids are not guaranteed unique
+    local_ids = {f"c{n}": pos for n, (pos, _) in enumerate(pack)}
+    payload = [{"complaint_id": f"c{n}", "text": text} for n, (_, text) in enumerate(pack)]
+
+    response = None
+    try:
+        async with _get_semaphore():
+            start = time.perf_counter()
+            response = await llm.acomplete(
+                timeout=LLM_PACK_TIMEOUT_SECONDS,
+                model=ANALYSIS_MODEL,
+                messages=[
+                    {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                    {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+                ],
+                temperature=0,
+                response_format={"type": "json_object"}
+            )
+        results = json.loads(response.content).get("results", [])
+    except Exception as e:
+        print(f"LLM Pack Error ({len(pack)} items): {e}")
+        PACK_STATS["pack_errors"] += 1
+        _record_failure("analysis_packed", start, e, response, items=len(pack))
+        return {}
+
+    PACK_STATS["packs"] += 1
+    parsed = {}
+    for item in results if isinstance(results, list) else []:
+        try:
+            pos = local_ids.get(str(item.get("complaint_id")))
+            if pos is not None and pos not in parsed:
+                parsed[pos] = DetailedAnalysis(**item)
+        except Exception:
+            continue  # this item falls back to the single-item path
+
+    # Items missing from the reply are retried singly; count the pack by what it delivered
+    llm_metrics.record(
+        "analysis_packed", ANALYSIS_MODEL, _elapsed_ms(start), response,
+        outcome="success" if parsed else "parse_failure", items=len(parsed)
+    )
+    return parsed
+
+
+async def analyze_complex_packed(
+    items: List[Tuple[str, str]],
+    use_cache: bool = True
+) -> List[Optional[DetailedAnalysis]]:
+    """
+    Packed variant of analyze_complex_batch. Cached items are served first, the
+    rest are packed by token budget; each returned item is validated on its own
+    and only the ones that fail are re-run on the single-item path.
+    """
+    results = await _cached_analyses(items, use_cache)
+    pending = [(pos, items[pos][0]) for pos, cached in enumerate(results) if cached is None]
+
+    packs = _build_packs(pending)
+    fresh = []
+    for parsed in await asyncio.gather(*(_run_pack(pack) for pack in packs)):
+        for pos, analysis in parsed.items():
+            text, cid = items[pos]
+            analysis.complaint_id = cid
+            fresh.append((text, analysis))
+            results[pos] = analysis
+            PACK_STATS["packed_items"] += 1
+    # Same key as the single path: a re-upload hits whichever path filled it
+    await _store_analyses(fresh, use_cache)
+
+    retry = [pos for pos, _ in pending if results[pos] is None]
+    if retry:
+        PACK_STATS["fallback_items"] += len(retry)
+        singles = await asyncio.gather(
+            *(_analyze_uncached(items[pos][0], items[pos][1], use_cache) for pos in retry)
+        )
+        for pos, analysis in zip(retry, singles):
+            results[pos] = analysis
+
+    return results
+
 
 def generate_executive_report(data_context: dict) -> dict:
     """
     Returns Structured JSON for the Strategy Dashboard.
     """
-    if not GROQ_API_KEY:
+    if LLM_BACKEND == "groq" and not GROQ_API_KEY:
         return {"error": "API Key Missing"}
 
     # 1. THE PROMPT
     # We explicitly ask for a LIST of strings for the plan to prevent JSON breakage
+    clusters = data_context.get('complaint_clusters') or []
+    if clusters:
+        # Pre-clustered locally: fixed-size summaries, not raw complaints
+        input_block = (
+            f"INPUT DATA (Complaint Clusters from the last {data_context.get('analyzed_window', 0)} complaints, "
+            f"with counts, shares, keywords and representative examples):\n"
+            f"    {json.dumps(clusters, indent=2)}"
+        )
+        cluster_rule = (
+            "Pick exactly 3 distinct technical issues from the clusters. Use the cluster counts "
+            "(merge clusters that describe the same issue) and ignore non-technical clusters."
+        )
+    else:
+        input_block = (
+            "INPUT DATA (Recent Complaints):\n"
+            f"    {json.dumps(data_context.get('recent_complaints', []), indent=2)}"
+        )
+        cluster_rule = "Identify exactly 3 distinct technical clusters."
+
     system_prompt = f"""
     You are a Senior Product Strategy AI. 
     Analyze the following customer complaints and generate a structured JSON report.
 
-    INPUT DATA (Recent Complaints):
-    {json.dumps(data_context.get('recent_complaints', []), indent=2)}
+    {input_block}
 
     OUTPUT FORMAT (JSON ONLY):
     {{
@@ -100,13 +441,15 @@ def generate_executive_report(data_context: dict) -> dict:
     }}
 
     RULES:
-    1. Identify exactly 3 distinct technical clusters.
+    1. {cluster_rule}
     2. "remediation_steps": Provide 3-4 specific engineering actions. Do not use asterisks or bullet points inside the strings.
     """
 
+    response = None
+    start = time.perf_counter()
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile", 
+        response = llm.complete(
+            model=ANALYSIS_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": "Generate structured JSON report."}
@@ -116,7 +459,7 @@ def generate_executive_report(data_context: dict) -> dict:
         )
         
         # 2. PARSE AND FORMAT
-        raw_data = json.loads(completion.choices[0].message.content)
+        raw_data = json.loads(response.content)
         
         # Convert list of steps back to a single string for the frontend
         plan_text = ""
@@ -125,6 +468,7 @@ def generate_executive_report(data_context: dict) -> dict:
         elif "remediation_plan" in raw_data:
             plan_text = raw_data["remediation_plan"]
             
+        llm_metrics.record("report", ANALYSIS_MODEL, _elapsed_ms(start), response)
         return {
             "top_issues": raw_data.get("top_issues", []),
             "remediation_plan": plan_text
@@ -132,6 +476,7 @@ def generate_executive_report(data_context: dict) -> dict:
 
     except Exception as e:
         print(f"LLM Error: {e}")
+        _record_failure("report", start, e, response)
         return {
             "top_issues": [],
             "remediation_plan": "Unable to generate plan due to processing error."
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+import numpy as np
+
+from app.core.llm_backends import LLMResponse
+
+
+class _EndpointMetrics:
+    def __init__(self, window: int):
+        self.calls = 0
+        self.items = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_total_ms = 0.0
+        self.outcomes = defaultdict(int)
+        self.cache = defaultdict(int)
+        self.models = defaultdict(int)
+        # Rolling window of real (non-cached) call latencies for percentiles
+        self.latencies = deque(maxlen=window)
+
+
+class LLMMetrics:
+    """
+    In-process registry of LLM calls: latency, tokens, cost, cache status and
+    outcome per endpoint ("analysis", "analysis_packed", "report"), plus the
+    calls that never reached the LLM (router, cache, semantic reuse).
+    """
+
+    OUTCOMES = ("success", "parse_failure", "error", "circuit_open")
+
+    def __init__(self, window: int = 2000, price_input_per_mtok: float = 0.0,
+                 price_output_per_mtok: float = 0.0):
+        self.window = window
+        self.price_input_per_mtok = price_input_per_mtok
+        self.price_output_per_mtok = price_output_per_mtok
+        self.started_at = time.time()
+        self._endpoints = {}
+        self._avoided = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.price_input_per_mtok
+                + completion_tokens * self.price_output_per_mtok) / 1_000_000
+
+    def _endpoint(self, name: str) -> _EndpointMetrics:
+        if name not in self._endpoints:
+            self._endpoints[name] = _EndpointMetrics(self.window)
+        return self._endpoints[name]
+
+    def record(
+        self,
+        endpoint: str,
+        model: str,
+        latency_ms: float,
+        response: Optional[LLMResponse] = None,
+        outcome: str = "success",
+        items: int = 1
+    ) -> None:
+        """
+        One real LLM request. `response` is None when the call itself failed.
+        """
+        prompt_tokens = response.prompt_tokens if response is not None else 0
+        completion_tokens = response.completion_tokens if response is not None else 0
+        with self._lock:
+            m = self._endpoint(endpoint)
+            m.calls += 1
+            m.items += items
+            m.prompt_tokens += prompt_tokens
+            m.completion_tokens += completion_tokens
+            m.cost_usd += self.cost(prompt_tokens, completion_tokens)
+            m.latency_total_ms += latency_ms
+            m.outcomes[outcome] += 1
+            m.cache["miss"] += 1
+            m.models[model] += 1
+            m.latencies.append(latency_ms)
+
+    def record_rejected(self, endpoint: str, items: int = 1) -> None:
+        """
+        A request the circuit breaker refused: nothing was sent, so it counts
+        as an outcome but not as a call (no latency, tokens or cost).
+        """
+        with self._lock:
+            self._endpoint(endpoint).outcomes["circuit_open"] += items
+
+    def record_cache_hit(self, endpoint: str, items: int = 1) -> None:
+        with self._lock:
+            self._endpoint(endpoint).cache["hit"] += items
+            self._avoided["cache"] += items
+
+    def record_avoided(self, reason: str, items: int = 1) -> None:
+        """
+        Complaints resolved without an LLM call ("router", "semantic_reuse", "batch_dedup").
+        """
+        if items:
+            with self._lock:
+                self._avoided[reason] += items
+
+    @staticmethod
+    def _percentiles(samples) -> dict:
+        if not samples:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 90, 99])
+        return {"p50": round(p50, 1), "p90": round(p90, 1), "p99": round(p99, 1),
+                "max": round(max(samples), 1)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {}
+            calls = items = prompt = completion = 0
+            cost = analysis_cost = 0.0
+            analysis_items = 0
+            for name, m in self._endpoints.items():
+                endpoints[name] = {
+                    "calls": m.calls,
+                    "items": m.items,
+                    "outcomes": dict(m.outcomes),
+                    "cache": dict(m.cache),
+                    "models": dict(m.models),
+                    "tokens": {"prompt": m.prompt_tokens, "completion": m.completion_tokens},
+                    "cost_usd": round(m.cost_usd, 6),
+                    "latency_ms": {
+                        "mean": round(m.latency_total_ms / m.calls, 1) if m.calls else 0.0,
+                        "window": len(m.latencies),
+                        **self._percentiles(m.latencies)
+                    }
+                }
+                calls += m.calls
+                items += m.items
+                prompt += m.prompt_tokens
+                completion += m.completion_tokens
+                cost += m.cost_usd
+                if name.startswith("analysis"):
+                    analysis_cost += m.cost_usd
+                    analysis_items += m.items
+
+            # What the avoided complaints would have cost at the observed per-complaint price
+            cost_per_item = analysis_cost / analysis_items if analysis_items else 0.0
+            avoided = dict(self._avoided)
+            avoided_total = sum(avoided.values())
+            return {
+                "since": self.started_at,
+                "pricing_usd_per_mtok": {
+                    "input": self.price_input_per_mtok,
+                    "output": self.price_output_per_mtok
+                },
+                "endpoints": endpoints,
+                "totals": {
+                    "calls": calls,
+                    "items": items,
+                    "tokens": {"prompt": prompt, "completion": completion},
+                    "cost_usd": round(cost, 6)
+                },
+                "savings": {
+                    "avoided_items": avoided,
+                    "llm_share": round(analysis_items / (analysis_items + avoided_total), 4)
+                    if analysis_items + avoided_total else 0.0,
+                    "cost_per_analyzed_item_usd": round(cost_per_item, 8),
+                    "estimated_saved_usd": round(cost_per_item * avoided_total, 6)
+                }
+            }
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.schemas import RoutingDecision
+
+# ------------------------------------------------------------------
+# PROCESS-POOL ROUTING (large batch uploads)
+# ------------------------------------------------------------------
+# Each worker process loads its own embedder once (initializer) and routes whole
+# chunks with route_complaints. Results come back in input order.
+# A pool that gets replaced (new worker count or new anchors) is retired: the
+# streams still using it finish on it, and it shuts down after the last one.
+
+# Torch threads per worker. 1 avoids N workers x M threads oversubscribing cores.
+WORKER_TORCH_THREADS = int(os.getenv("ROUTER_WORKER_THREADS", "1"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_anchor_version = -1
+_pool_users: Dict[ProcessPoolExecutor, int] = {}
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    try:
+        import torch
+        torch.set_num_threads(WORKER_TORCH_THREADS)
+    except Exception:
+        pass
+    from app.core.router import warmup
+    warmup()
+
+
+def _route_chunk(texts: List[str]) -> List[Optional[RoutingDecision]]:
+    from app.core.router import route_complaint, route_complaints
+    try:
+        return route_complaints(texts)
+    except Exception as e:
+        # Isolate the bad row(s) instead of failing the whole chunk
+        print(f"[POOL] Chunk failed ({e}), retrying row by row")
+        results = []
+        for text in texts:
+            try:
+                results.append(route_complaint(text))
+            except Exception:
+                results.append(None)
+        return results
+
+
+def acquire_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Shared pool, recreated when the worker count or the learned anchors change
+    (workers load anchors once at start-up). Every acquire_pool() must be
+    paired with release_pool() once the caller is done submitting to it.
+    """
+    global _pool, _pool_workers, _pool_anchor_version
+    from app.core.router import anchors_version
+
+    with _pool_lock:
+        version = anchors_version()
+        if _pool is None or _pool_workers != workers or _pool_anchor_version != version:
+            if _pool is not None and not _pool_users.get(_pool):
+                _pool_users.pop(_pool, None)
+                _pool.shutdown(wait=False)
+            # spawn: forking a process that already holds torch threads is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+            _pool_workers = workers
+            _pool_anchor_version = version
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+
+def release_pool(pool: ProcessPoolExecutor):
+    with _pool_lock:
+        users = _pool_users.get(pool, 0) - 1
+        if users > 0:
+            _pool_users[pool] = users
+            return
+        _pool_users.pop(pool, None)
+        if pool is not _pool:
+            # Retired pool, last user gone
+            pool.shutdown(wait=False)
+
+
+def shutdown_pool():
+    """
+    Shuts down every pool, retired ones included. Call after the batch jobs
+    using them have been cancelled.
+    """
+    global _pool
+    with _pool_lock:
+        pools = set(_pool_users)
+        if _pool is not None:
+            pools.add(_pool)
+        _pool = None
+        _pool_users.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def chunked(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def route_complaints_parallel(
+    texts: Iterable[str],
+    workers: int,
+    chunk_size: int = 256,
+    max_in_flight: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[RoutingDecision]]]:
+    """
+    Shards texts into chunks across `workers` processes and yields
+    (text, decision) per text, in input order, as soon as each chunk (and all
+    before it) is done. A row whose routing failed yields None.
+    `texts` may be a lazy stream: at most `max_in_flight` chunks (default
+    2 x workers) are read ahead, so memory does not grow with the input.
+    """
+    pool = acquire_pool(workers)
+    try:
+        max_in_flight = max_in_flight or 2 * workers
+        in_flight = deque()
+        for chunk in chunked(texts, chunk_size):
+            in_flight.append((chunk, pool.submit(_route_chunk, chunk)))
+            if len(in_flight) >= max_in_flight:
+                chunk, future = in_flight.popleft()
+                yield from zip(chunk, future.result())
+        while in_flight:
+            chunk, future = in_flight.popleft()
+            yield from zip(chunk, future.result())
+    finally:
+        release_pool(pool)
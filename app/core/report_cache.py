@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+
+class ReportCache:
+    """
+    Last generated executive report plus the history watermark it was built from.
+    Persisted to a small JSON file so restarts keep serving the previous report.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entry: Optional[dict] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entry = json.load(f)
+        except Exception as e:
+            print(f"[REPORT] Failed to load cached report: {e}")
+
+    def get(self) -> Optional[dict]:
+        with self._lock:
+            return self._entry
+
+    def put(self, report: dict, watermark: list) -> dict:
+        entry = {"report": report, "watermark": watermark, "generated_at": time.time()}
+        with self._lock:
+            self._entry = entry
+            self.refreshes += 1
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[REPORT] Failed to persist report: {e}")
+        return entry
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "stale":
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+
+    def try_begin_refresh(self) -> bool:
+        """
+        Single-flight guard: only one background refresh runs at a time.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def end_refresh(self) -> None:
+        with self._lock:
+            self._refreshing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            entry = self._entry
+            return {
+                "cached": entry is not None,
+                "age_seconds": round(time.time() - entry["generated_at"], 1) if entry else None,
+                "watermark": entry["watermark"] if entry else None,
+                "refreshing": self._refreshing,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+            }
@@ -0,0 +1,209 @@
+import csv
+import hashlib
+import json
+import os
+import random
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REVIEW_QUEUE_FIELDS = ["id", "text", "reason_for_flagging", "created_at"]
+
+
+class ReviewQueue:
+    """
+    The human review queue as an append-only JSONL log of events:
+        {"op": "enqueue", "id", "text", "reason_for_flagging", "created_at"}
+        {"op": "validate", "id", "at"}            <- tombstone
+    Replaying the log gives the live view (id -> row) and the dedup index of
+    normalized-text hashes, so enqueue and validate are O(1) appends.
+
+    Tombstones accumulate until compact() rewrites the log with only the live
+    rows; the rewrite goes to a temp file that atomically replaces the log.
+    """
+
+    def __init__(self, path: str, legacy_csv_path: Optional[str] = None):
+        self.path = path
+        self.legacy_csv_path = legacy_csv_path
+        self._live: Optional[Dict[str, dict]] = None    # review id -> row (insertion order)
+        self._index: Dict[str, str] = {}                # text hash -> review id
+        self._log = None
+        self._log_events = 0
+        self._tombstones = 0
+        self.compactions = 0
+        # One lock for check-then-append: batch and /analyze writers can't race
+        self._lock = threading.RLock()
+        # Only one compaction at a time (it runs mostly outside _lock)
+        self._compact_lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+    # --- LOG ---
+    def _apply(self, event: dict) -> None:
+        op = event.get("op")
+        if op == "enqueue":
+            row = {field: event.get(field, "") for field in REVIEW_QUEUE_FIELDS}
+            self._live[row["id"]] = row
+            if row["text"]:
+                self._index.setdefault(self.text_hash(row["text"]), row["id"])
+        elif op == "validate":
+            row = self._live.pop(event.get("id"), None)
+            if row is not None:
+                h = self.text_hash(row["text"])
+                if self._index.get(h) == row["id"]:
+                    del self._index[h]
+            self._tombstones += 1
+        self._log_events += 1
+
+    @staticmethod
+    def _op(line: str) -> Optional[str]:
+        try:
+            return json.loads(line).get("op")
+        except ValueError:
+            return None
+
+    def _replay(self, f) -> None:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            self._apply(event)
+
+    def _append(self, event: dict) -> None:
+        self._log.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._log.flush()
+        self._apply(event)
+
+    def _open_log(self) -> None:
+        self._log = open(self.path, "a", encoding="utf-8")
+
+    def _migrate_legacy_csv(self) -> None:
+        with open(self.legacy_csv_path, "r", newline="", encoding="utf-8") as f:
+            rows = [row for row in csv.DictReader(f) if row.get("text")]
+        for row in rows:
+            self._append({"op": "enqueue", **{field: row.get(field, "") for field in REVIEW_QUEUE_FIELDS}})
+        os.replace(self.legacy_csv_path, f"{self.legacy_csv_path}.migrated")
+        print(f"[REVIEW QUEUE] Migrated {len(rows)} rows from {self.legacy_csv_path}")
+
+    def _ensure_loaded(self) -> None:
+        if self._live is not None:
+            return
+        self._live, self._index = {}, {}
+        self._log_events = self._tombstones = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        fresh = not os.path.exists(self.path)
+        if not fresh:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._replay(f)
+        self._open_log()
+        if fresh and self.legacy_csv_path and os.path.exists(self.legacy_csv_path):
+            self._migrate_legacy_csv()
+        print(f"[REVIEW QUEUE] Loaded {len(self._live)} pending items ({self._tombstones} tombstones)")
+
+    # --- API ---
+    def add(self, text: str, reason: str) -> Optional[str]:
+        """
+        Enqueues the complaint unless an equivalent text is already pending.
+        Returns the new review id, or None for a duplicate.
+        """
+        h = self.text_hash(text)
+        with self._lock:
+            self._ensure_loaded()
+            if h in self._index:
+                return None
+
+            review_id = f"rev_{int(datetime.now().timestamp())}_{random.randint(1000,9999)}"
+            while review_id in self._live:
+                review_id = f"rev_{int(datetime.now().timestamp())}_{random.randint(1000,9999)}"
+            self._append({
+                "op": "enqueue",
+                "id": review_id,
+                "text": text,
+                "reason_for_flagging": reason,
+                "created_at": datetime.now().isoformat()
+            })
+            return review_id
+
+    def remove(self, review_id: str) -> bool:
+        """
+        Validates (removes) an item by appending a tombstone; O(1).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if review_id not in self._live:
+                return False
+            self._append({"op": "validate", "id": review_id, "at": datetime.now().isoformat()})
+            return True
+
+    def rows(self) -> List[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(row) for row in self._live.values()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._live)
+
+    # --- COMPACTION ---
+    def should_compact(self, min_tombstones: int = 1000, max_garbage_ratio: float = 0.5) -> bool:
+        with self._lock:
+            if self._live is None or self._tombstones < min_tombstones:
+                return False
+            garbage = self._log_events - len(self._live)
+            return garbage / max(1, self._log_events) >= max_garbage_ratio
+
+    def compact(self) -> None:
+        """
+        Rewrites the log with one enqueue event per live row. Writers are only
+        blocked for the snapshot and the final swap: events appended while the
+        snapshot is being written are copied over from the old log's tail.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._ensure_loaded()
+                self._log.flush()
+                snapshot = list(self._live.values())
+                offset = os.path.getsize(self.path)
+
+            tmp = f"{self.path}.compact.tmp"
+            with open(tmp, "w", encoding="utf-8") as out:
+                for row in snapshot:
+                    out.write(json.dumps({"op": "enqueue", **row}, ensure_ascii=False) + "\n")
+
+                with self._lock:
+                    self._log.flush()
+                    with open(self.path, "rb") as old:
+                        old.seek(offset)
+                        tail = old.read().decode("utf-8")
+                    out.write(tail)
+                    out.flush()
+                    os.fsync(out.fileno())
+
+                    self._log.close()
+                    os.replace(tmp, self.path)
+                    self._open_log()
+                    tail_ops = [self._op(line) for line in tail.splitlines()]
+                    self._log_events = len(snapshot) + len(tail_ops)
+                    self._tombstones = tail_ops.count("validate")
+                    self.compactions += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+                self._live = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._live) if self._live is not None else None,
+                "log_events": self._log_events,
+                "tombstones": self._tombstones,
+                "compactions": self.compactions,
+            }
@@ -1,81 +1,469 @@
-import torch
-from sentence_transformers import SentenceTransformer, util
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from app.core.anchor_index import AnchorIndex
+from app.core.embedding_backends import load_backend
+from app.core.embedding_cache import EmbeddingCache
 from app.core.schemas import RoutingDecision
 
-print("Loading Models...")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+# torch | torch-int8 | onnx-int8 (see app/core/embedding_backends.py)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
 
 # ------------------------------------------------------------------
 # SIMPLE ANCHORS (Admin / Praise)
 # ------------------------------------------------------------------
-simple_anchors = [
+# Anchor text -> tag used when a complaint's closest anchor is this one
+simple_anchor_labels = {
     # Admin / Account / Shipping
-    "reset password", "forgot my password", "cannot login", "login issue",
-    "where is my invoice", "request invoice", "refund request", "cancel subscription",
-    "payment failed", "where is my receipt", "shipping status", "track my order",
-    "return policy", "warranty check", "change address",
+    "reset password": "Authentication", "forgot my password": "Authentication",
+    "cannot login": "Authentication", "login issue": "Authentication",
+    "where is my invoice": "Billing/Account", "request invoice": "Billing/Account",
+    "refund request": "Billing/Account", "cancel subscription": "Billing/Account",
+    "payment failed": "Billing/Account", "where is my receipt": "Billing/Account",
+    "shipping status": "Logistics", "track my order": "Logistics",
+    "return policy": "Returns/Warranty", "warranty check": "Returns/Warranty",
+    "change address": "Logistics",
 
     # Pure Praise
-    "great product", "excellent service", "very happy with the purchase",
-    "amazing experience", "fast delivery", "packaging was perfect"
+    "great product": "Positive Feedback", "excellent service": "Positive Feedback",
+    "very happy with the purchase": "Positive Feedback",
+    "amazing experience": "Positive Feedback", "fast delivery": "Positive Feedback",
+    "packaging was perfect": "Positive Feedback"
+}
+simple_anchors = list(simple_anchor_labels)
+
+# Bump when the way anchors are encoded changes (invalidates stored .npy files)
+ANCHOR_CACHE_VERSION = 1
+ANCHOR_CACHE_DIR = os.getenv("ANCHOR_CACHE_DIR", "data/anchor_cache")
+
+# ------------------------------------------------------------------
+# LAZY MODEL LOADING
+# ------------------------------------------------------------------
+# Nothing heavy happens at import time. The model and anchor matrix are loaded
+# on first use, or up front by warmup() from the FastAPI startup hook.
+_embedder = None
+_simple_embeddings = None
+_load_lock = threading.RLock()
+
+WARMUP_STATS: Dict[str, object] = {}
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _load_lock:
+            if _embedder is None:
+                print(f"Loading Models... ({EMBED_MODEL_NAME}, backend={EMBED_BACKEND})")
+                _embedder = load_backend(EMBED_BACKEND, EMBED_MODEL_NAME)
+    return _embedder
+
+
+def _anchor_cache_path() -> str:
+    fingerprint = json.dumps(
+        {
+            "version": ANCHOR_CACHE_VERSION,
+            "model": EMBED_MODEL_NAME,
+            "backend": EMBED_BACKEND,
+            "anchors": simple_anchors
+        }
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(ANCHOR_CACHE_DIR, f"anchors_v{ANCHOR_CACHE_VERSION}_{digest}.npy")
+
+
+def get_simple_embeddings() -> np.ndarray:
+    """
+    L2-normalized anchor matrix (n_anchors, dim).
+    Memory-mapped from a versioned .npy file; recomputed only when the anchor
+    list, model name or backend changes (the file name is a hash of them).
+    """
+    global _simple_embeddings
+    if _simple_embeddings is None:
+        with _load_lock:
+            if _simple_embeddings is None:
+                _simple_embeddings = _load_or_build_anchors()
+    return _simple_embeddings
+
+
+def _load_or_build_anchors() -> np.ndarray:
+    path = _anchor_cache_path()
+    if os.path.exists(path):
+        try:
+            anchors = np.load(path, mmap_mode="r")
+            if anchors.shape[0] == len(simple_anchors):
+                return anchors
+        except Exception as e:
+            print(f"[ROUTER] Ignoring unreadable anchor cache {path}: {e}")
+
+    embedder = get_embedder()
+    anchors = embedder.encode(simple_anchors, normalize=True)
+
+    try:
+        os.makedirs(ANCHOR_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, anchors)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[ROUTER] Failed to persist anchor cache: {e}")
+
+    return anchors
+
+
+def warmup() -> dict:
+    """
+    Loads the model and anchors and routes one dummy complaint.
+    Returns (and prints) the cold-start timings.
+    """
+    t0 = time.perf_counter()
+    get_embedder()
+    t1 = time.perf_counter()
+    anchors_cached = os.path.exists(_anchor_cache_path())
+    get_anchor_index()
+    t2 = time.perf_counter()
+    route_complaints(["warmup request"])
+    t3 = time.perf_counter()
+
+    WARMUP_STATS.update({
+        "model": EMBED_MODEL_NAME,
+        "backend": EMBED_BACKEND,
+        "model_load_ms": round((t1 - t0) * 1000, 1),
+        "anchor_load_ms": round((t2 - t1) * 1000, 1),
+        "anchors_from_cache": anchors_cached,
+        "first_request_ms": round((t3 - t2) * 1000, 1),
+        "cold_start_to_first_request_ms": round((t3 - t0) * 1000, 1),
+    })
+    print(f"[ROUTER] Warmup complete: {WARMUP_STATS}")
+    return dict(WARMUP_STATS)
+
+
+# ------------------------------------------------------------------
+# ANCHOR INDEX (seed anchors + anchors learned from annotators)
+# ------------------------------------------------------------------
+LEARNED_ANCHORS_PATH = os.getenv("LEARNED_ANCHORS_PATH", "data/learned_anchors.jsonl")
+ANCHOR_ANN_THRESHOLD = int(os.getenv("ANCHOR_ANN_THRESHOLD", "5000"))
+
+_anchor_index = None
+_learned_anchor_ids: Dict[str, int] = {}  # stable anchor key -> id inside the index
+_anchor_version = 0  # bumped on every add/remove so other processes can tell they are stale
+
+
+def anchor_key(text: str) -> str:
+    return "anc_" + hashlib.sha1(EmbeddingCache.normalize(text).encode("utf-8")).hexdigest()[:16]
+
+
+def get_anchor_index() -> AnchorIndex:
+    global _anchor_index
+    if _anchor_index is None:
+        with _load_lock:
+            if _anchor_index is None:
+                seed = get_simple_embeddings()
+                index = AnchorIndex(dim=seed.shape[1], ann_threshold=ANCHOR_ANN_THRESHOLD)
+                index.add(simple_anchors, seed, [simple_anchor_labels[a] for a in simple_anchors])
+
+                learned = _load_learned_anchors()
+                if learned:
+                    keys = list(learned)
+                    texts = [learned[k][0] for k in keys]
+                    ids = index.add(texts, encode_texts(texts), [learned[k][1] for k in keys])
+                    _learned_anchor_ids.update(zip(keys, ids))
+                    print(f"[ROUTER] Loaded {len(keys)} learned anchors")
+
+                _anchor_index = index
+    return _anchor_index
+
+
+def _load_learned_anchors() -> Dict[str, tuple]:
+    """
+    Replays the add/remove log into {key: (text, label)}.
+    """
+    learned: Dict[str, tuple] = {}
+    if not os.path.exists(LEARNED_ANCHORS_PATH):
+        return learned
+    with open(LEARNED_ANCHORS_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if event.get("op") == "add":
+                learned[event["key"]] = (event["text"], event["label"])
+            elif event.get("op") == "remove":
+                learned.pop(event["key"], None)
+    return learned
+
+
+def _append_anchor_events(events: List[dict]):
+    try:
+        os.makedirs(os.path.dirname(LEARNED_ANCHORS_PATH) or ".", exist_ok=True)
+        with open(LEARNED_ANCHORS_PATH, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"[ROUTER] Failed to persist anchor change: {e}")
+
+
+def add_anchors(texts: List[str], labels: List[str]) -> List[str]:
+    """
+    Adds (or relabels) anchors without a restart. Returns their stable keys.
+    """
+    index = get_anchor_index()
+    vectors = encode_texts(texts)
+    keys = [anchor_key(t) for t in texts]
+
+    with _load_lock:
+        stale = [_learned_anchor_ids.pop(k) for k in keys if k in _learned_anchor_ids]
+        index.remove(stale)
+        ids = index.add(texts, vectors, labels)
+        _learned_anchor_ids.update(zip(keys, ids))
+        _bump_anchor_version()
+        _append_anchor_events([
+            {"op": "add", "key": k, "text": t, "label": label}
+            for k, t, label in zip(keys, texts, labels)
+        ])
+    return keys
+
+
+def remove_anchors(keys: List[str]) -> int:
+    index = get_anchor_index()
+    with _load_lock:
+        ids = [_learned_anchor_ids.pop(k) for k in keys if k in _learned_anchor_ids]
+        removed = index.remove(ids)
+        _bump_anchor_version()
+        _append_anchor_events([{"op": "remove", "key": k} for k in keys])
+    return removed
+
+
+def _bump_anchor_version():
+    global _anchor_version
+    _anchor_version += 1
+
+
+def anchors_version() -> int:
+    return _anchor_version
+
+
+def anchor_stats() -> dict:
+    stats = get_anchor_index().stats()
+    stats["seed_anchors"] = len(simple_anchors)
+    stats["learned_anchors"] = len(_learned_anchor_ids)
+    return stats
+
+
+# ------------------------------------------------------------------
+# EMBEDDING CACHE (shared by single and batch routing)
+# ------------------------------------------------------------------
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+# Empty string disables the on-disk store
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "data/embedding_cache.sqlite")
+# Rows kept in the on-disk store (~1.5 KB each for 384-d vectors)
+EMBED_CACHE_MAX_DISK_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_DISK_ENTRIES", "100000"))
+
+embedding_cache = EmbeddingCache(
+    max_entries=EMBED_CACHE_SIZE,
+    path=EMBED_CACHE_PATH or None,
+    max_disk_entries=EMBED_CACHE_MAX_DISK_ENTRIES,
+    # Quantized backends produce slightly different vectors, keep them apart
+    namespace=f"{EMBED_MODEL_NAME}:{EMBED_BACKEND}",
+)
+
+# ------------------------------------------------------------------
+# KEYWORD RULES
+# ------------------------------------------------------------------
+# Admin keyword -> tag (100% Simple). Dict order is the match precedence.
+ADMIN_MAP = {
+    "invoice": "Billing/Account", "billing": "Billing/Account",
+    "refund": "Billing/Account", "subscription": "Billing/Account",
+    "payment": "Billing/Account", "receipt": "Billing/Account",
+    "password": "Authentication", "login": "Authentication",
+    "shipping": "Logistics", "delivery": "Logistics",
+    "tracking": "Logistics", "order status": "Logistics",
+    "return": "Returns/Warranty", "warranty": "Returns/Warranty"
+}
+_ADMIN_ORDER = {keyword: i for i, keyword in enumerate(ADMIN_MAP)}
+
+# Trigger GPU Tier. Covers: Phones, Laptops, Audio, Wearables
+TECHNICAL_KEYWORDS = [
+    # Hardware
+    "battery", "screen", "display", "pixel", "keyboard", "mouse", "trackpad",
+    "hinge", "port", "usb", "charger", "charging", "fan", "noise", "overheat",
+    "camera", "lens", "focus", "button", "switch", "sensor", "bluetooth", "wifi",
+    "connection", "pairing", "sound", "audio", "speaker", "microphone", "mic",
+
+    # Software / Performance
+    "crash", "freeze", "lag", "slow", "update", "firmware", "install", "boot",
+    "loop", "glitch", "error", "blue screen", "shut down", "won't turn on"
 ]
 
-simple_embeddings = embedder.encode(simple_anchors, convert_to_tensor=True)
+# Negative / Sarcasm triggers
+NEGATIVE_KEYWORDS = [
+    "bad", "terrible", "worst", "hate", "broken", "awful", "useless",
+    "disappointed", "waste", "garbage", "trash", "fail", "scam", "nightmare",
+    "never buy", "joke", "ridiculous"
+]
+
+# Contrast (Mixed Sentiment)
+CONTRAST_KEYWORDS = ["but", "however", "although", "except", "despite"]
+
+# Substring matching is the historical behaviour ("mic" fires on "microwave").
+# Set ROUTER_WORD_BOUNDARY=1 to only match whole words (plus s/es/ed/ing).
+KEYWORD_WORD_BOUNDARY = os.getenv("ROUTER_WORD_BOUNDARY", "0") == "1"
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Builds a regex alternation factored as a prefix trie, e.g.
+    ["bad", "battery", "boot"] -> "b(?:a(?:d|ttery)|oot)".
+    At every text position the engine follows a single branch, so matching cost
+    depends on text length and keyword length, not on how many keywords exist.
+    Longer keywords win over their prefixes (greedy optional groups).
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds keyword hits for several categories in one pass over the text.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]], word_boundary: bool = False):
+        self.categories = list(categories)
+        self._lookup: Dict[str, List[str]] = {}
+        for category, words in categories.items():
+            for word in words:
+                self._lookup.setdefault(word, []).append(category)
+
+        alternation = _trie_regex(list(self._lookup))
+        if word_boundary:
+            self._pattern = re.compile(rf"\b({alternation})(?:s|es|ed|ing)?\b")
+        else:
+            # Zero-width lookahead so hits may overlap ("support" still yields "port")
+            self._pattern = re.compile(rf"(?=({alternation}))")
+
+    def match(self, text_lower: str) -> Dict[str, List[str]]:
+        hits: Dict[str, List[str]] = {category: [] for category in self.categories}
+        for m in self._pattern.finditer(text_lower):
+            for category in self._lookup[m.group(1)]:
+                hits[category].append(m.group(1))
+        return hits
+
+
+keyword_matcher = KeywordMatcher(
+    {
+        "admin": list(ADMIN_MAP),
+        "technical": TECHNICAL_KEYWORDS,
+        "negative": NEGATIVE_KEYWORDS,
+        "contrast": CONTRAST_KEYWORDS,
+    },
+    word_boundary=KEYWORD_WORD_BOUNDARY,
+)
 
 # ------------------------------------------------------------------
 # ROUTER LOGIC
 # ------------------------------------------------------------------
 def route_complaint(text: str) -> RoutingDecision:
+    # 1. VECTOR SIMILARITY (The "Vibe" Check)
+    scores, labels = _nearest_anchors(encode_texts([text]))
+
+    return _decide(text, scores[0], labels[0])
+
+
+def route_complaints(texts: List[str], batch_size: int = 64) -> List[RoutingDecision]:
+    """
+    Batch version of route_complaint.
+    Encodes all texts in padded mini-batches and scores them against the anchors
+    with a single similarity matrix. Output order matches input order.
+    """
+    if not texts:
+        return []
+
+    scores, labels = _nearest_anchors(encode_texts(texts, batch_size=batch_size))
+
+    return [_decide(text, score, label) for text, score, label in zip(texts, scores, labels)]
+
+
+def _nearest_anchors(embeddings: np.ndarray):
+    """
+    Cosine similarity and label of each row's closest anchor.
+    """
+    return get_anchor_index().nearest(embeddings)
+
+
+def encode_texts(texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """
+    Embeds texts through the LRU cache. Only cache misses reach the model,
+    each distinct miss is encoded once. Returns an (n, dim) array in input order.
+    """
+    vectors = embedding_cache.get_many(texts)
+
+    missing = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(embedding_cache.key(texts[i]), []).append(i)
+
+    if missing:
+        miss_texts = [texts[positions[0]] for positions in missing.values()]
+
+        # Length-bucketed ordering: neighbours in a mini-batch have similar lengths,
+        # so padding to the longest item in the batch wastes little compute.
+        order = sorted(range(len(miss_texts)), key=lambda i: len(miss_texts[i]))
+        sorted_texts = [miss_texts[i] for i in order]
+        encoded = get_embedder().encode(sorted_texts, batch_size=batch_size)
+
+        embedding_cache.put_many(sorted_texts, encoded)
+        miss_groups = list(missing.values())
+        for pos, miss_idx in enumerate(order):
+            for i in miss_groups[miss_idx]:
+                vectors[i] = encoded[pos]
+
+    return np.stack(vectors).astype(np.float32, copy=False)
+
+
+def _decide(text: str, best_score: float, anchor_label: Optional[str] = None) -> RoutingDecision:
+    """
+    Keyword rules + anchor score -> RoutingDecision.
+    Shared by the single and batch paths so both give identical decisions.
+    """
     text_lower = text.lower()
 
-    # 1. VECTOR SIMILARITY (The "Vibe" Check)
-    user_embedding = embedder.encode(text, convert_to_tensor=True)
-    scores = util.cos_sim(user_embedding, simple_embeddings)
-    best_score = torch.max(scores).item()
+    hits = keyword_matcher.match(text_lower)
 
     # 2. ADMIN KEYWORDS (100% Simple)
-    admin_map = {
-        "invoice": "Billing/Account", "billing": "Billing/Account",
-        "refund": "Billing/Account", "subscription": "Billing/Account",
-        "payment": "Billing/Account", "receipt": "Billing/Account",
-        "password": "Authentication", "login": "Authentication",
-        "shipping": "Logistics", "delivery": "Logistics",
-        "tracking": "Logistics", "order status": "Logistics",
-        "return": "Returns/Warranty", "warranty": "Returns/Warranty"
-    }
-
+    # Same precedence as before: first keyword in ADMIN_MAP order wins
     admin_tag = None
-    for keyword, tag in admin_map.items():
-        if keyword in text_lower:
-            admin_tag = tag
-            break
+    if hits["admin"]:
+        first_keyword = min(hits["admin"], key=_ADMIN_ORDER.get)
+        admin_tag = ADMIN_MAP[first_keyword]
 
     # 3. TECHNICAL KEYWORDS (Trigger GPU Tier)
-    # Covers: Phones, Laptops, Audio, Wearables
-    technical_keywords = [
-        # Hardware
-        "battery", "screen", "display", "pixel", "keyboard", "mouse", "trackpad",
-        "hinge", "port", "usb", "charger", "charging", "fan", "noise", "overheat",
-        "camera", "lens", "focus", "button", "switch", "sensor", "bluetooth", "wifi",
-        "connection", "pairing", "sound", "audio", "speaker", "microphone", "mic",
-        
-        # Software / Performance
-        "crash", "freeze", "lag", "slow", "update", "firmware", "install", "boot",
-        "loop", "glitch", "error", "blue screen", "shut down", "won't turn on"
-    ]
-    is_technical = any(word in text_lower for word in technical_keywords)
+    is_technical = bool(hits["technical"])
 
     # 4. NEGATIVE / SARCASM TRIGGERS
-    negative_keywords = [
-        "bad", "terrible", "worst", "hate", "broken", "awful", "useless",
-        "disappointed", "waste", "garbage", "trash", "fail", "scam", "nightmare",
-        "never buy", "joke", "ridiculous"
-    ]
-    is_negative = any(word in text_lower for word in negative_keywords)
+    is_negative = bool(hits["negative"])
 
     # 5. CONTRAST (Mixed Sentiment)
-    contrast_keywords = ["but", "however", "although", "except", "despite"]
-    has_contrast = any(w in text_lower for w in contrast_keywords)
+    has_contrast = bool(hits["contrast"])
 
     # --- DECISION LOGIC ---
 
@@ -98,13 +486,14 @@ def route_complaint(text: str) -> RoutingDecision:
             reason=f"Auto-Resolved: {admin_tag}"
         )
 
-    # CASE C: Pure Praise -> Simple
+    # CASE C: Close to a known Simple anchor (praise, admin or learned) -> Simple
     if best_score > 0.45:
+        label = anchor_label or "Positive Feedback"
         return RoutingDecision(
             decision="Simple",
             confidence=round(best_score, 2),
-            tags=["Positive Feedback"],
-            reason="Auto-Resolved: Positive Feedback"
+            tags=[label],
+            reason=f"Auto-Resolved: {label}"
         )
 
     # CASE D: Safety Net -> GPU Tier
@@ -26,7 +26,8 @@ class SentimentAspect(BaseModel):
 
 class DetailedAnalysis(BaseModel):
     complaint_id: str
-    status: Literal["Success", "Review_Queue"]  # <--- New Field
+    status: Literal["Success", "Review_Queue", "Deferred"]  # <--- Deferred = LLM unavailable, retry later
     flag_reason: Optional[str] = None            # <--- Why did it fail?
     aspects: List[SentimentAspect] = []
-    summary: str
\ No newline at end of file
+    summary: str
+    reused_from: Optional[str] = None             # <--- Set when copied from a near-duplicate
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.llm_engine import analyze_complex_batch, llm_metrics
+from app.core.router import encode_texts
+from app.core.schemas import DetailedAnalysis
+
+# ------------------------------------------------------------------
+# SEMANTIC REUSE (near-duplicate complaints skip the LLM)
+# ------------------------------------------------------------------
+SEMANTIC_REUSE_ENABLED = os.getenv("SEMANTIC_REUSE_ENABLED", "1") == "1"
+# Cosine similarity above which a neighbour's analysis is reused as-is
+SEMANTIC_REUSE_THRESHOLD = float(os.getenv("SEMANTIC_REUSE_THRESHOLD", "0.95"))
+# How many recently analyzed complaints are remembered
+SEMANTIC_REUSE_WINDOW = int(os.getenv("SEMANTIC_REUSE_WINDOW", "5000"))
+
+
+class RecentAnalysisIndex:
+    """
+    Rolling window of recently analyzed complaint embeddings and their analyses.
+    A fixed-size ring buffer: the oldest entry is overwritten once full.
+    """
+
+    def __init__(self, capacity: int, threshold: float):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._matrix: Optional[np.ndarray] = None
+        self._analyses: List[Optional[DetailedAnalysis]] = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.reused = 0
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def add(self, vectors: np.ndarray, analyses: List[DetailedAnalysis]) -> None:
+        vectors = self._normalize(vectors)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+            for vector, analysis in zip(vectors, analyses):
+                self._matrix[self._next] = vector
+                self._analyses[self._next] = analysis
+                self._next = (self._next + 1) % self.capacity
+                self._size = min(self._size + 1, self.capacity)
+
+    def lookup(self, vectors: np.ndarray) -> List[Optional[DetailedAnalysis]]:
+        """
+        The stored analysis of the closest neighbour above the threshold, per row.
+        """
+        vectors = self._normalize(vectors)
+        with self._lock:
+            if self._size == 0:
+                return [None] * len(vectors)
+            scores = vectors @ self._matrix[:self._size].T
+            best = scores.argmax(axis=1)
+            found = []
+            for row, pos in enumerate(best):
+                if scores[row, pos] >= self.threshold:
+                    found.append(self._analyses[pos])
+                else:
+                    found.append(None)
+            return found
+
+    def record(self, lookups: int, reused: int) -> None:
+        with self._lock:
+            self.lookups += lookups
+            self.reused += reused
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": SEMANTIC_REUSE_ENABLED,
+                "threshold": self.threshold,
+                "window": self.capacity,
+                "entries": self._size,
+                "lookups": self.lookups,
+                "reused": self.reused,
+                "reuse_rate": round(self.reused / self.lookups, 4) if self.lookups else 0.0,
+            }
+
+
+recent_analyses = RecentAnalysisIndex(SEMANTIC_REUSE_WINDOW, SEMANTIC_REUSE_THRESHOLD)
+
+
+def _reuse(source: DetailedAnalysis, complaint_id: str) -> DetailedAnalysis:
+    return source.copy(update={
+        "complaint_id": complaint_id,
+        "reused_from": source.reused_from or source.complaint_id
+    })
+
+
+async def analyze_with_reuse(
+    items: List[Tuple[str, str]],
+    use_cache: bool = True,
+    packed: bool = False
+) -> Tuple[List[Optional[DetailedAnalysis]], int]:
+    """
+    Drop-in for analyze_complex_batch that first reuses analyses of near-identical
+    complaints, both from the rolling index and from earlier items in `items`.
+    Returns (analyses in input order, number of LLM calls saved).
+    use_cache=False bypasses reuse as well: every item gets a fresh LLM call.
+    """
+    if not items:
+        return [], 0
+    if not SEMANTIC_REUSE_ENABLED or not use_cache:
+        return await analyze_complex_batch(items, use_cache=use_cache, packed=packed), 0
+
+    # Embeddings were just computed by the router, so these are cache hits
+    vectors = await asyncio.to_thread(encode_texts, [text for text, _ in items])
+    normalized = RecentAnalysisIndex._normalize(vectors)
+    neighbours = recent_analyses.lookup(normalized)
+
+    results: List[Optional[DetailedAnalysis]] = [None] * len(items)
+    leaders: List[int] = []     # items that go to the LLM
+    followers = {}              # item -> leader it duplicates (within this call)
+    saved = 0
+
+    for pos, neighbour in enumerate(neighbours):
+        if neighbour is not None:
+            results[pos] = _reuse(neighbour, items[pos][1])
+            saved += 1
+            continue
+        if leaders:
+            scores = normalized[leaders] @ normalized[pos]
+            best = int(scores.argmax())
+            if scores[best] >= SEMANTIC_REUSE_THRESHOLD:
+                followers[pos] = leaders[best]
+                continue
+        leaders.append(pos)
+
+    analyses = await analyze_complex_batch(
+        [items[pos] for pos in leaders], use_cache=use_cache, packed=packed
+    )
+    fresh_positions, fresh_analyses = [], []
+    for pos, analysis in zip(leaders, analyses):
+        results[pos] = analysis
+        if analysis is not None and analysis.status != "Deferred":
+            fresh_positions.append(pos)
+            fresh_analyses.append(analysis)
+
+    for pos, leader in followers.items():
+        source = results[leader]
+        if source is None:
+            continue  # the leader failed too, the row takes the normal LLM-failure fallback
+        if source.status == "Deferred":
+            results[pos] = source.copy(update={"complaint_id": items[pos][1]})
+            continue
+        results[pos] = _reuse(source, items[pos][1])
+        saved += 1
+
+    if fresh_positions:
+        recent_analyses.add(normalized[fresh_positions], fresh_analyses)
+    recent_analyses.record(len(items), saved)
+    llm_metrics.record_avoided("semantic_reuse", saved)
+
+    return results, saved
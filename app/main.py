@@ -1,18 +1,58 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Body
+from fastapi import FastAPI, HTTPException, UploadFile, File, Body, Query
+from fastapi.responses import StreamingResponse
 from app.core.schemas import ComplaintInput, RoutingDecision, DetailedAnalysis
-from app.core.router import route_complaint
-from app.core.llm_engine import analyze_complex_complaint, generate_executive_report
+from app.core.batcher import MicroBatcher
+from app.core.clustering import cluster_complaints
+from app.core.report_cache import ReportCache
+from app.core.history_store import HistoryStore, HISTORY_FIELDS
+from app.core.history_writer import HistoryWriter
+from app.core.review_queue import ReviewQueue
+from app.core.parallel_router import chunked, route_complaints_parallel, shutdown_pool
+from app.core.csv_stream import CSVStream
+from app.core.batch_jobs import ACTIVE_STATUSES, BatchJob, BatchJobManager
+from app.core.batch_dedup import BatchDeduper, batch_row_id
+from app.core.batch_results import BatchResultStore, RESULT_FIELDS
+from app.core.router import (
+    route_complaints, warmup, embedding_cache, WARMUP_STATS,
+    ADMIN_MAP, add_anchors, remove_anchors, anchor_stats
+)
+from app.core.llm_engine import (
+    generate_executive_report, llm, llm_cache, llm_metrics, PACK_STATS
+)
+from app.core.semantic_reuse import analyze_with_reuse, recent_analyses
 import csv
 import os
-import pandas as pd
 from io import StringIO
 import asyncio 
 from fastapi.middleware.cors import CORSMiddleware
 import random
+from itertools import chain, islice
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, closing
+import json
 from datetime import datetime
 import traceback
+import time
+from typing import Optional
+
 
-app = FastAPI(title="Smart Complaint Routing System")
+# --- LIFESPAN: start-up and shutdown, in an explicit order ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warmup_router()
+    await import_legacy_history()
+    await start_review_compactor()
+    await resume_batch_jobs()
+    yield
+    # Batch jobs first: they use the router pool, the history writer and the
+    # review queue, and a cancelled job keeps its checkpoint for the next start
+    await stop_batch_jobs()
+    await stop_router()
+    await flush_history()
+    await stop_review_compactor()
+
+
+app = FastAPI(title="Smart Complaint Routing System", lifespan=lifespan)
 
 # --- CORS BLOCK ---
 origins = ["http://localhost:3000"]
@@ -27,14 +67,118 @@ app.add_middleware(
 # ensure data folder exists
 os.makedirs("data", exist_ok=True)
 
+
+# --- ROUTING MICRO-BATCHER ---
+# Concurrent /analyze calls are grouped into one embedding pass off the event loop
+router_batcher = MicroBatcher(
+    route_complaints,
+    max_batch_size=int(os.getenv("ROUTER_MAX_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("ROUTER_MAX_WAIT_MS", "5")),
+    name="router-batcher"
+)
+
+
+# --- PARALLEL BATCH ROUTING ---
+# Router processes for large uploads (0/1 = serial). Override per request with ?workers=N
+BATCH_ROUTER_WORKERS = int(os.getenv("BATCH_ROUTER_WORKERS", "0"))
+# Below this many rows the pool start-up costs more than it saves
+PARALLEL_MIN_ROWS = int(os.getenv("PARALLEL_MIN_ROWS", "2000"))
+# Rows routed and sent to Tier 2 together (bounds memory and in-flight LLM calls)
+BATCH_WINDOW_SIZE = int(os.getenv("BATCH_WINDOW_SIZE", "256"))
+# Rows buffered ahead of the router before duplicates are routed anyway (memory bound)
+BATCH_DEDUP_MAX_BACKLOG = int(os.getenv("BATCH_DEDUP_MAX_BACKLOG", "4096"))
+# Distinct texts remembered per job for duplicate collapsing (LRU, ~250 B each)
+BATCH_DEDUP_MAX_TEXTS = int(os.getenv("BATCH_DEDUP_MAX_TEXTS", "100000"))
+# Packed Tier 2 prompts for batch jobs (override per request with ?packed=false)
+LLM_PACK_BATCH = os.getenv("LLM_PACK_BATCH", "1") == "1"
+# Upload read size and how many rows the response preview carries
+BATCH_READ_CHUNK_BYTES = int(os.getenv("BATCH_READ_CHUNK_BYTES", str(1 << 20)))
+BATCH_PREVIEW_LIMIT = int(os.getenv("BATCH_PREVIEW_LIMIT", "1000"))
+# Filtered result totals remembered for finished jobs (one COUNT per job and filter)
+BATCH_RESULTS_TOTALS_CACHE = int(os.getenv("BATCH_RESULTS_TOTALS_CACHE", "256"))
+
+
+# --- STARTUP: load the Tier 1 model once, before the first request ---
+async def warmup_router():
+    try:
+        warmup()
+    except Exception as e:
+        # The router still loads lazily on first request
+        print(f"[STARTUP] Router warmup failed: {e}")
+    await router_batcher.start()
+
+
+async def stop_router():
+    await router_batcher.stop()
+    await asyncio.to_thread(shutdown_pool)
+
+
+@app.get("/router/stats")
+async def get_router_stats():
+    return {
+        "warmup": WARMUP_STATS,
+        "embedding_cache": embedding_cache.stats(),
+        "batcher": router_batcher.stats(),
+        "anchors": anchor_stats()
+    }
+
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    return {
+        "cache": llm_cache.stats(),
+        "packing": PACK_STATS,
+        "semantic_reuse": recent_analyses.stats(),
+        "resilience": llm.stats()
+    }
+
+
+@app.get("/llm/metrics")
+async def get_llm_metrics():
+    """
+    Per-endpoint call counts, outcomes, tokens, cost and rolling latency
+    percentiles, plus how many complaints never needed an LLM call.
+    """
+    return llm_metrics.stats()
+
+
+# --- SIMPLE-TIER ANCHORS (learned from annotators) ---
+# Annotator labels that mean "this should have been auto-resolved" -> router tag
+ANCHOR_LABELS = {"positive": "Positive Feedback", "positive feedback": "Positive Feedback"}
+ANCHOR_LABELS.update({tag.lower(): tag for tag in ADMIN_MAP.values()})
+
+
+@app.post("/anchors")
+async def create_anchors(payload: dict = Body(...)):
+    """
+    Expected payload: {"anchors": [{"text": "...", "label": "Billing/Account"}, ...]}
+    """
+    items = [a for a in payload.get("anchors", []) if str(a.get("text", "")).strip()]
+    labels = [ANCHOR_LABELS.get(str(a.get("label", "")).lower().strip()) for a in items]
+    if not items or None in labels:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Each anchor needs text and one of the labels: {sorted(set(ANCHOR_LABELS.values()))}"
+        )
+    keys = await asyncio.to_thread(add_anchors, [a["text"].strip() for a in items], labels)
+    return {"status": "ok", "keys": keys}
+
+
+@app.delete("/anchors/{key}")
+async def delete_anchor(key: str):
+    removed = await asyncio.to_thread(remove_anchors, [key])
+    if not removed:
+        raise HTTPException(status_code=404, detail="Anchor not found")
+    return {"status": "ok", "key": key}
+
 # --- BATCH PERSISTENCE (NEW) ---
+# Summary of the latest batch only; its rows live in the job's result store
 BATCH_STATE_FILE = "data/latest_batch.json"
 
 def save_latest_batch(payload: dict):
     try:
         with open(BATCH_STATE_FILE, "w", encoding="utf-8") as f:
-            import json
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+            json.dump(payload, f, ensure_ascii=False)
     except Exception as e:
         print(f"[BATCH] Failed to persist latest batch: {e}")
 
@@ -43,7 +187,6 @@ def load_latest_batch():
         return None
     try:
         with open(BATCH_STATE_FILE, "r", encoding="utf-8") as f:
-            import json
             return json.load(f)
     except Exception as e:
         print(f"[BATCH] Failed to load latest batch: {e}")
@@ -51,13 +194,76 @@ def load_latest_batch():
 
 
 # --- 1. PERSISTENCE LAYER (New Feature) ---
-def log_to_history(data: dict):
+# SQLite (WAL) history; the old CSV log is imported once on startup
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/history.sqlite")
+LEGACY_HISTORY_CSV = "data/history_log.csv"
+history_store = HistoryStore(HISTORY_DB_PATH)
+history_writer = HistoryWriter(
+    history_store.append_many,
+    group_size=int(os.getenv("HISTORY_GROUP_SIZE", "500")),
+    flush_interval_ms=float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "200")),
+    max_queue=int(os.getenv("HISTORY_MAX_QUEUE", "20000"))
+)
+
+
+# Set to 1 to recompute the dashboard counters from the history on every startup
+STATS_REBUILD_ON_STARTUP = os.getenv("STATS_REBUILD_ON_STARTUP", "0") == "1"
+
+
+async def import_legacy_history():
+    try:
+        await asyncio.to_thread(history_store.import_csv, LEGACY_HISTORY_CSV)
+    except Exception as e:
+        print(f"[HISTORY] Legacy CSV import failed: {e}")
+    try:
+        # Counters are maintained at write time; this only rebuilds them when missing or off
+        await asyncio.to_thread(history_store.ensure_counters, STATS_REBUILD_ON_STARTUP)
+        # Replays the review queue log once (live view + dedup index)
+        history_store.set_counter("pending_reviews", await asyncio.to_thread(len, review_queue))
+    except Exception as e:
+        print(f"[HISTORY] Counter rebuild failed: {e}")
+    await history_writer.start()
+
+
+async def flush_history():
+    # Guaranteed flush: everything queued is written before the process exits
+    await history_writer.stop()
+
+
+@app.get("/history/stats")
+async def get_history_stats():
+    return {"writer": history_writer.stats(), "counters": history_store.counters()}
+
+
+@app.get("/history/export")
+async def export_history():
+    """
+    Full history in the legacy history_log.csv layout, streamed.
+    """
+    def rows():
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=HISTORY_FIELDS)
+        writer.writeheader()
+        for n, row in enumerate(history_store.iter_rows(), start=1):
+            writer.writerow(row)
+            if n % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=history_log.csv"}
+    )
+
+async def log_to_history(data: dict):
     """
-    Saves every single analysis to a CSV file for future access.
+    Saves every single analysis to the history store for future access.
+    Write-behind: the row is queued and written in a group by history_writer.
     This is defensive: handles routing/analysis as dicts or Pydantic models.
     """
-    file_path = "data/history_log.csv"
-    file_exists = os.path.isfile(file_path)
 
     # Defensive extraction of routing and confidence
     routing = data.get("routing", {})
@@ -102,63 +308,72 @@ def log_to_history(data: dict):
         "status": data.get("status", "")
     }
 
-    # Write safely (append)
-    with open(file_path, "a", newline="", encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
+    await history_writer.submit(row)
 
 
 # --- 2. EXISTING HELPERS ---
-def log_to_review_queue(text: str, reason: str):
-    """
-    Add complaint to human_review_queue.csv exactly once.
-    Prevents duplicates using text match.
-    """
-    os.makedirs("data", exist_ok=True)
-    file_path = "data/human_review_queue.csv"
+# Append-only event log; the old CSV queue is migrated into it on first load
+REVIEW_QUEUE_PATH = "data/human_review_queue.jsonl"
+LEGACY_REVIEW_QUEUE_CSV = "data/human_review_queue.csv"
+REVIEW_COMPACT_INTERVAL_SECONDS = float(os.getenv("REVIEW_COMPACT_INTERVAL_SECONDS", "60"))
+REVIEW_COMPACT_MIN_TOMBSTONES = int(os.getenv("REVIEW_COMPACT_MIN_TOMBSTONES", "1000"))
+review_queue = ReviewQueue(REVIEW_QUEUE_PATH, legacy_csv_path=LEGACY_REVIEW_QUEUE_CSV)
+_compactor_task: Optional[asyncio.Task] = None
+
+
+async def _compact_review_queue_periodically():
+    while True:
+        await asyncio.sleep(REVIEW_COMPACT_INTERVAL_SECONDS)
+        try:
+            if review_queue.should_compact(REVIEW_COMPACT_MIN_TOMBSTONES):
+                await asyncio.to_thread(review_queue.compact)
+                print(f"[REVIEW QUEUE] Compacted: {review_queue.stats()}")
+        except Exception as e:
+            print(f"[REVIEW QUEUE] Compaction failed: {e}")
 
-    # Load existing entries to prevent duplicates
-    existing_texts = set()
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                existing_texts.add(row.get("text", "").strip())
 
-    # Skip if already present
-    if text.strip() in existing_texts:
-        return
+async def start_review_compactor():
+    global _compactor_task
+    _compactor_task = asyncio.create_task(_compact_review_queue_periodically())
 
-    review_id = f"rev_{int(datetime.now().timestamp())}_{random.randint(1000,9999)}"
 
-    with open(file_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["id", "text", "reason_for_flagging", "created_at"]
-        )
+async def stop_review_compactor():
+    if _compactor_task is not None:
+        _compactor_task.cancel()
+    review_queue.close()
 
-        # Write header once
-        if f.tell() == 0:
-            writer.writeheader()
+def _enqueue_review(text: str, reason: str) -> None:
+    if review_queue.add(text, reason) is not None:
+        history_store.bump("pending_reviews")
 
-        writer.writerow({
-            "id": review_id,
-            "text": text,
-            "reason_for_flagging": reason,
-            "created_at": datetime.now().isoformat()
-        })
+
+def _validate_review(review_id: str) -> bool:
+    if not review_queue.remove(review_id):
+        return False
+    history_store.bump("pending_reviews", -1)
+    return True
+
+
+async def log_to_review_queue(text: str, reason: str):
+    """
+    Add complaint to the human review queue exactly once.
+    Prevents duplicates with an O(1) lookup in the queue's text-hash index.
+    The log append and the counter commit run off the event loop.
+    """
+    await asyncio.to_thread(_enqueue_review, text, reason)
 
 
 
 # --- 3. MAIN ENDPOINTS ---
 @app.post("/analyze", response_model=dict)
-async def analyze_complaint(payload: ComplaintInput):
+async def analyze_complaint(
+    payload: ComplaintInput,
+    no_cache: bool = Query(False, description="Bypass the LLM response cache")
+):
     print(f"Received complaint: {payload.text}")
 
-    # 1. ROUTER (CPU)
-    routing_result = route_complaint(payload.text)
+    # 1. ROUTER (CPU) - micro-batched with other in-flight requests
+    routing_result = await router_batcher.submit(payload.text)
 
     final_response = {
         "id": payload.id,
@@ -171,6 +386,7 @@ async def analyze_complaint(payload: ComplaintInput):
     # 2. LOGIC
     if routing_result.decision == "Simple":
         final_response["status"] = "Auto-Resolved (Simple)"
+        llm_metrics.record_avoided("router")
 
         # --- UI STANDARDIZATION ---
         simple_tag = routing_result.tags[0] if routing_result.tags else "General"
@@ -185,17 +401,22 @@ async def analyze_complaint(payload: ComplaintInput):
         }
 
     elif routing_result.decision == "Complex":
-        analysis = analyze_complex_complaint(payload.text, payload.id)
+        analyses, _ = await analyze_with_reuse([(payload.text, payload.id)], use_cache=not no_cache)
+        analysis = analyses[0]
 
         if analysis:
             # analysis is expected to be a Pydantic model DetailedAnalysis
             if getattr(analysis, "status", None) == "Review_Queue":
                 # LLM flagged it for human review
                 flag_reason = getattr(analysis, "flag_reason", "Flagged by LLM")
-                log_to_review_queue(payload.text, flag_reason)
+                await log_to_review_queue(payload.text, flag_reason)
                 final_response["routing"]["decision"] = "Review_Queue"
                 final_response["routing"]["reason"] = f"LLM Flagged: {flag_reason}"
                 final_response["status"] = "Flagged by AI Judge"
+            elif getattr(analysis, "status", None) == "Deferred":
+                # Provider throttled/down: keep the request, analysis can be retried later
+                final_response["analysis"] = analysis
+                final_response["status"] = "Deferred (LLM unavailable)"
             else:
                 final_response["analysis"] = analysis
                 final_response["status"] = "Processed by Tier 1b"
@@ -204,7 +425,7 @@ async def analyze_complaint(payload: ComplaintInput):
 
     # 3. SAVE TO HISTORY (Persistence)
     try:
-        log_to_history(final_response)
+        await log_to_history(final_response)
     except Exception as e:
         print(f"Failed to log history: {e}")
 
@@ -215,167 +436,529 @@ async def analyze_complaint(payload: ComplaintInput):
 # REAL BATCH PROCESSING (CONSISTENT, ROBUST & HONEST INSIGHTS)
 # ------------------------------------------------------------------
 @app.get("/batch/latest")
-async def get_latest_batch():
+async def get_latest_batch(limit: int = Query(BATCH_PREVIEW_LIMIT, ge=1, le=BATCH_PREVIEW_LIMIT)):
+    """
+    Latest batch summary plus the first `limit` result rows as its preview;
+    page on with /batch/jobs/{job_id}/results?cursor=next_cursor.
+    """
     data = load_latest_batch()
     if not data:
         return {"exists": False}
+    job = batch_jobs.get(data.get("job_id", ""))
+    if job is not None and "preview" not in data:
+        page = await asyncio.to_thread(_results_page, job, None, limit, {})
+        data = {**data, "preview": page["items"], "next_cursor": page["next_cursor"]}
     return {"exists": True, "data": data}
 
 # ------------------------------------------------------------------
 # HIGH-ACCURACY BATCH PROCESSING (Llama 3 for Batch)
 # ------------------------------------------------------------------
-@app.post("/batch/upload")
-async def batch_upload(file: UploadFile = File(...)):
-    if not file.filename or not file.filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported.")
-    
-    try:
-        import io
-        contents = await file.read()
-
-        # Robust CSV Parsing
-        try:
-            df = pd.read_csv(io.BytesIO(contents), engine="python", on_bad_lines="skip", encoding="utf-8")
-        except Exception:
-            df = pd.read_csv(io.BytesIO(contents), engine="python", on_bad_lines="skip", encoding="latin1")
-
-        total_items = len(df)
-        if total_items == 0: raise ValueError("CSV file is empty.")
-
-        # Column detection
-        cols = list(df.columns)
-        text_col = next((c for c in cols if "text" in c.lower() or "complaint" in c.lower()), cols[0])
-
-        preview_data = []
-        auto_resolved = 0
-        critical_count = 0
-        negative_count = 0
-        row_errors = 0
-
-        # LIMIT FOR DEMO: Only process first 30 rows with Llama to prevent timeouts
-        # In production, this would be an async background job (Celery/Jenkins)
-        demo_limit = 30 
+async def run_batch_job(job: BatchJob) -> dict:
+    """
+    The batch pipeline for one job: streams the job's CSV from its last
+    checkpoint, routes + analyzes it window by window, reports progress and
+    commits a checkpoint every BATCH_CHECKPOINT_ROWS rows.
+    Rows go to the job's BatchResultStore; returns the job summary
+    (the /batch/upload payload without the preview).
+    """
+    workers = job.options.get("workers")
+    no_cache = job.options.get("no_cache", False)
+    packed = job.options.get("packed", LLM_PACK_BATCH)
+
+    results = job_results(job)
+    with open(job.upload_path, "rb") as raw, closing(results):
+        # Streaming CSV parsing: chunked reads, incremental encoding detection,
+        # constant memory
+        stream = CSVStream(raw, chunk_size=BATCH_READ_CHUNK_BYTES)
+        text_stream = stream.texts()
+
+        # Resume: restore the accumulators and skip the rows already committed
+        committed = job.checkpoint["committed_rows"]
+        state = job.checkpoint["state"] or {}
+        processed_rows = state.get("processed_rows", 0)
+        analyzed_rows = state.get("analyzed_rows", 0)
+        auto_resolved = state.get("auto_resolved", 0)
+        critical_count = state.get("critical", 0)
+        negative_count = state.get("negative", 0)
+        row_errors = state.get("row_errors", 0)
+        llm_calls_saved = state.get("llm_calls_saved", 0)
+        deferred_count = state.get("deferred", 0)
+        duplicate_rows = state.get("duplicate_rows", 0)
+        dedup_llm_saved = state.get("dedup_llm_saved", 0)
+        dedup_forced_routes = state.get("dedup_forced_routes", 0)
+        previous_seconds = state.get("processing_seconds", 0.0)
+        if committed:
+            await asyncio.to_thread(lambda: deque(islice(text_stream, committed), maxlen=0))
+
+        def checkpoint_state() -> dict:
+            return {
+                "processed_rows": processed_rows,
+                "analyzed_rows": analyzed_rows,
+                "auto_resolved": auto_resolved,
+                "critical": critical_count,
+                "negative": negative_count,
+                "row_errors": row_errors,
+                "llm_calls_saved": llm_calls_saved,
+                "deferred": deferred_count,
+                "duplicate_rows": duplicate_rows,
+                "dedup_llm_saved": dedup_llm_saved,
+                "dedup_forced_routes": dedup_forced_routes,
+                "processing_seconds": previous_seconds + time.perf_counter() - processing_start
+            }
 
-        for idx, (_, row) in enumerate(df.iterrows(), start=1):
-            if idx > demo_limit: break # Stop after 30 for speed
+        processing_start = time.perf_counter()
+        # Read ahead up to PARALLEL_MIN_ROWS rows to tell small uploads from big ones
+        head = await asyncio.to_thread(lambda: list(islice(text_stream, PARALLEL_MIN_ROWS)))
+        if not head and not committed:
+            raise ValueError("CSV file is empty.")
+        # Exact duplicates are routed and analyzed once; their rows reuse that outcome.
+        # (After a resume the map starts empty: rows before the checkpoint don't count.)
+        dedup = BatchDeduper(max_backlog=BATCH_DEDUP_MAX_BACKLOG, max_texts=BATCH_DEDUP_MAX_TEXTS)
+        texts = dedup.unique(chain(head, text_stream))
+
+        # 1. TIER 1: CPU ROUTER (Instant Filter)
+        # We still use this to catch "Invoices" so we don't waste LLM credits on them
+        # Serial: one batched forward pass per window. Parallel: chunks sharded over a
+        # process pool, streamed back in order. Both pull rows from the CSV lazily.
+        if workers is None:
+            workers = BATCH_ROUTER_WORKERS if len(head) >= PARALLEL_MIN_ROWS else 0
+        routing_mode = "parallel" if workers > 1 else "serial"
+
+        if routing_mode == "parallel":
+            routed = route_complaints_parallel(texts, workers)
+        else:
+            routed = (
+                pair
+                for window in chunked(texts, BATCH_WINDOW_SIZE)
+                for pair in zip(window, route_complaints(window))
+            )
+
+        # Work in windows: read + route a window off the event loop, then send all its
+        # Complex rows to Llama 3 concurrently, then build its rows in order.
+        window_start = committed
+        last_commit = committed
+        # Rows past the checkpoint may have reached the history before a crash. The
+        # writer is FIFO, so once a window has none of its ids there, no later one does.
+        replaying = committed > 0
+        # Windows of at most BATCH_WINDOW_SIZE rows: routed ones plus their duplicates
+        windows = dedup.windows(routed, BATCH_WINDOW_SIZE)
+        while True:
+            window = await asyncio.to_thread(next, windows, None)
+            if window is None:
+                break
+            window_texts = [text for text, _, _, _ in window]
+            # Stable and unique: the job id plus the row's position in the upload
+            window_cids = [batch_row_id(job.id, window_start + offset) for offset in range(len(window))]
+
+            # 2. TIER 2: LLM ANALYSIS (High Accuracy), bounded concurrency
+            complex_rows = [
+                i for i, (_, _, first, r) in enumerate(window)
+                if first and r is not None and r.decision != "Simple"
+            ]
+            llm_metrics.record_avoided(
+                "router", sum(1 for _, _, first, r in window if first and r is not None and r.decision == "Simple")
+            )
+            # Near-duplicates of recently analyzed complaints reuse that analysis
+            analyses, saved = await analyze_with_reuse(
+                [(window_texts[i], window_cids[i]) for i in complex_rows],
+                use_cache=not no_cache,
+                packed=packed
+            )
+            llm_calls_saved += saved
+            analyzed_rows += len(complex_rows)
+            analysis_by_row = dict(zip(complex_rows, analyses))
+            window_results = []
+            dedup_saved_before = dedup_llm_saved
+            already_logged = set()
+            if replaying:
+                already_logged = await asyncio.to_thread(history_store.existing_ids, window_cids)
+                replaying = bool(already_logged)
+
+            for offset, (text, key, first, router_result) in enumerate(window):
+                idx = window_start + offset + 1
+                try:
+                    cid = window_cids[offset]
+
+                    if not first:
+                        # Exact duplicate: fan out the outcome of its first occurrence
+                        outcome = dedup.outcome(key)
+                        if outcome is None:
+                            raise ValueError("duplicate of a row that failed")
+                        decision, tag, sentiment, sentiment_score, action = outcome
+                        duplicate_rows += 1
+                        if router_result is not None:
+                            dedup_forced_routes += 1
+                        if decision == "Simple":
+                            auto_resolved += 1
+                        else:
+                            dedup_llm_saved += 1
+                        negative_count += sentiment == "Negative"
+                        critical_count += action == "Urgent Escalation"
+                        deferred_count += action == "Retry Later"
 
-            try:
-                raw = row.get(text_col, "")
-                text = str(raw).strip() if pd.notna(raw) else ""
-                
-                # 1. TIER 1: CPU ROUTER (Instant Filter)
-                # We still use this to catch "Invoices" so we don't waste LLM credits on them
-                router_result = route_complaint(text)
-                decision = router_result.decision
-                
-                cid = f"req_{random.randint(1000, 9999)}"
-                
-                # Defaults
-                sentiment = "Neutral"
-                sentiment_score = 50
-                tag = "Processing"
-                action = "Pending"
-
-                if decision == "Simple":
-                    # CPU HANDLED
-                    auto_resolved += 1
-                    sentiment = "Neutral"
-                    action = "Auto-Reply Sent"
-                    tag = router_result.tags[0] if router_result.tags else "General"
-                    if "Positive" in tag:
-                        sentiment = "Positive"
-                        sentiment_score = 95
                     else:
-                        sentiment_score = 90
-                
-                else: 
-                    # 2. TIER 2: LLM ANALYSIS (High Accuracy)
-                    # We call the exact same function used in the Single Dashboard
-                    analysis = analyze_complex_complaint(text, cid)
-                    
-                    if analysis and analysis.status == "Review_Queue":
-                        # LLM Flagged it (Sarcasm/Drift)
+                        if router_result is None:
+                            raise ValueError("routing failed")
+                        decision = router_result.decision
+
+                        # Defaults
                         sentiment = "Neutral"
-                        sentiment_score = 40
-                        tag = "Flagged for Review"
-                        action = "Queued for Manual Review"
-                        log_to_review_queue(text, analysis.flag_reason or "Flagged by AI")
-                    
-                    elif analysis and analysis.aspects:
-                        # LLM Success
-                        # We derive the "Batch Tag" from the first aspect identified by Llama
-                        main_aspect = analysis.aspects[0]
-                        tag = main_aspect.aspect.split(":")[-1].strip() # e.g. "Device: Keyboard" -> "Keyboard"
-                        
-                        raw_sentiment = main_aspect.sentiment.lower()
-                        
-                        if "negative" in raw_sentiment:
-                            sentiment = "Negative"
-                            sentiment_score = random.randint(20, 45)
-                            action = "Route to Engineering"
-                            negative_count += 1
-                            
-                            if "high" in main_aspect.severity.lower():
-                                tag = "Critical"
-                                action = "Urgent Escalation"
-                                critical_count += 1
-                        else:
-                            sentiment = "Neutral"
-                            sentiment_score = 75
-                            action = "Route to Support"
+                        sentiment_score = 50
+                        tag = "Processing"
+                        action = "Pending"
 
-                    else:
-                        # Fallback if LLM fails
-                        tag = "Technical"
-                        action = "Route to Support"
-
-                # 3. BUILD PREVIEW
-                preview_data.append({
-                    "id": cid,
-                    "text": text,
-                    "tag": tag,
-                    "sentiment": sentiment,
-                    "sentiment_score": sentiment_score,
-                    "action": action
-                })
-
-                # 4. PERSIST
-                log_to_history({
-                    "id": cid,
-                    "text": text,
-                    "routing": {"decision": decision, "confidence": sentiment_score/100},
-                    "analysis": {"summary": f"Batch processed: {action}"},
-                    "status": "Processed"
-                })
+                        if decision == "Simple":
+                            # CPU HANDLED
+                            auto_resolved += 1
+                            sentiment = "Neutral"
+                            action = "Auto-Reply Sent"
+                            tag = router_result.tags[0] if router_result.tags else "General"
+                            if "Positive" in tag:
+                                sentiment = "Positive"
+                                sentiment_score = 95
+                            else:
+                                sentiment_score = 90
 
-            except Exception as e:
-                print(f"Row {idx} error: {e}")
-                row_errors += 1
-                continue
+                        else:
+                            # Same analysis as the Single Dashboard, already fetched for the window
+                            analysis = analysis_by_row.get(offset)
+
+                            if analysis and analysis.status == "Review_Queue":
+                                # LLM Flagged it (Sarcasm/Drift)
+                                sentiment = "Neutral"
+                                sentiment_score = 40
+                                tag = "Flagged for Review"
+                                action = "Queued for Manual Review"
+                                await log_to_review_queue(text, analysis.flag_reason or "Flagged by AI")
+
+                            elif analysis and analysis.status == "Deferred":
+                                # Provider throttled/down: keep the row for a later retry
+                                tag = "Deferred"
+                                action = "Retry Later"
+                                deferred_count += 1
+
+                            elif analysis and analysis.aspects:
+                                # LLM Success
+                                # We derive the "Batch Tag" from the first aspect identified by Llama
+                                main_aspect = analysis.aspects[0]
+                                tag = main_aspect.aspect.split(":")[-1].strip() # e.g. "Device: Keyboard" -> "Keyboard"
+
+                                raw_sentiment = main_aspect.sentiment.lower()
+
+                                if "negative" in raw_sentiment:
+                                    sentiment = "Negative"
+                                    sentiment_score = random.randint(20, 45)
+                                    action = "Route to Engineering"
+                                    negative_count += 1
+
+                                    if "high" in main_aspect.severity.lower():
+                                        tag = "Critical"
+                                        action = "Urgent Escalation"
+                                        critical_count += 1
+                                else:
+                                    sentiment = "Neutral"
+                                    sentiment_score = 75
+                                    action = "Route to Support"
+
+                            else:
+                                # Fallback if LLM fails
+                                tag = "Technical"
+                                action = "Route to Support"
+
+                        dedup.set_outcome(key, (decision, tag, sentiment, sentiment_score, action))
+
+                    # 3. BUILD RESULT ROW (stored per job, keyed by upload position)
+                    processed_rows += 1
+                    window_results.append((idx - 1, {
+                        "id": cid,
+                        "text": text,
+                        "tag": tag,
+                        "sentiment": sentiment,
+                        "sentiment_score": sentiment_score,
+                        "action": action
+                    }))
+
+                    # 4. PERSIST
+                    if cid in already_logged:
+                        continue
+                    await log_to_history({
+                        "id": cid,
+                        "text": text,
+                        "routing": {"decision": decision, "confidence": sentiment_score/100},
+                        "analysis": {"summary": f"Batch processed: {action}"},
+                        "status": "Processed"
+                    })
+
+                except Exception as e:
+                    print(f"Row {idx} error: {e}")
+                    row_errors += 1
+                    continue
+
+            llm_metrics.record_avoided("batch_dedup", dedup_llm_saved - dedup_saved_before)
+            await asyncio.to_thread(results.add_many, window_results)
+            window_start += len(window)
+            job.progress(
+                rows_read=stream.rows,
+                rows_routed=window_start,
+                rows_analyzed=analyzed_rows,
+                errors=row_errors,
+                bytes_read=stream.bytes_read,
+                bytes_parsed=stream.bytes_parsed
+            )
+            if window_start - last_commit >= BATCH_CHECKPOINT_ROWS:
+                # Checkpoint only once this window's history rows are on disk
+                await history_writer.flush()
+                await job.commit(window_start, checkpoint_state())
+                last_commit = window_start
+
+        # The batch's history rows are on disk (and in /stats) before we answer
+        await history_writer.flush()
+        processing_seconds = previous_seconds + time.perf_counter() - processing_start
 
         # Recalculate stats
         response = {
             "id": random.randint(1000, 9999),
-            "filename": file.filename,
+            "job_id": job.id,
+            "filename": job.state["filename"],
             "status": "completed",
-            "items": len(preview_data),
-            "processed": len(preview_data),
+            "items": processed_rows,
+            "processed": processed_rows,
             "insights": {
                 "auto_resolved": auto_resolved,
                 "critical": critical_count,
                 "negative": negative_count,
-                "preview_rows": len(preview_data),
-                "row_errors": row_errors
-            },
-            "preview": preview_data
+                "preview_rows": min(processed_rows, BATCH_PREVIEW_LIMIT),
+                "row_errors": row_errors,
+                "llm_calls_saved": llm_calls_saved,
+                "deferred": deferred_count,
+                "unique_texts": window_start - duplicate_rows,
+                "duplicate_rows": duplicate_rows,
+                "dedup_ratio": round(duplicate_rows / window_start, 4) if window_start else 0.0,
+                "router_calls_saved": duplicate_rows - dedup_forced_routes,
+                "llm_calls_saved_by_dedup": dedup_llm_saved,
+                "routing_mode": routing_mode,
+                "routing_workers": max(workers, 1),
+                "processing_seconds": round(processing_seconds, 3),
+                "rows_per_sec": round(window_start / processing_seconds, 1) if processing_seconds > 0 else 0.0,
+                "rows_read": window_start,
+                "skipped_lines": stream.skipped_rows,
+                "encoding": stream.encoding,
+                "text_column": stream.text_column,
+                "preview_truncated": processed_rows > BATCH_PREVIEW_LIMIT
+            }
         }
 
+        await job.commit(window_start, checkpoint_state())
         save_latest_batch(response)
         return response
 
-    except Exception as e:
-        print("❌ BATCH ERROR:", e)
-        raise HTTPException(status_code=500, detail=str(e))
+
+BATCH_JOBS_DIR = "data/batch_jobs"
+BATCH_MAX_CONCURRENT_JOBS = int(os.getenv("BATCH_MAX_CONCURRENT_JOBS", "2"))
+# Rows between checkpoints; a restarted job redoes at most this many rows
+BATCH_CHECKPOINT_ROWS = int(os.getenv("BATCH_CHECKPOINT_ROWS", "1000"))
+# Finished jobs (results included) are deleted after this long; the latest batch is kept
+BATCH_JOBS_RETENTION_HOURS = float(os.getenv("BATCH_JOBS_RETENTION_HOURS", "168"))
+batch_jobs = BatchJobManager(BATCH_JOBS_DIR, run_batch_job, max_concurrent=BATCH_MAX_CONCURRENT_JOBS)
+
+
+async def prune_batch_jobs():
+    latest = load_latest_batch() or {}
+    await asyncio.to_thread(
+        batch_jobs.prune, BATCH_JOBS_RETENTION_HOURS * 3600, [latest.get("job_id")]
+    )
+
+
+async def resume_batch_jobs():
+    resumed = batch_jobs.resume_incomplete()
+    if resumed:
+        print(f"[BATCH JOB] Resumed {resumed} unfinished job(s)")
+    await prune_batch_jobs()
+
+
+async def stop_batch_jobs():
+    # Running jobs keep their last checkpoint and resume on the next start
+    await batch_jobs.shutdown()
+
+
+async def _start_batch_job(file: UploadFile, workers: Optional[int], no_cache: bool, packed: bool) -> BatchJob:
+    if not file.filename or not file.filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported.")
+    options = {"workers": workers, "no_cache": no_cache, "packed": packed}
+    await prune_batch_jobs()
+    job = await asyncio.to_thread(batch_jobs.create, file.file, file.filename, options)
+    return batch_jobs.start(job)
+
+
+@app.post("/batch/upload")
+async def batch_upload(
+    file: UploadFile = File(...),
+    workers: Optional[int] = Query(None, ge=0, description="Router processes (0/1 = serial)"),
+    no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+    packed: bool = Query(LLM_PACK_BATCH, description="Send several Complex rows per LLM request")
+):
+    """
+    Synchronous upload: runs the file as a background job and waits for it.
+    If the client goes away the job keeps running (see /batch/jobs).
+    """
+    job = await _start_batch_job(file, workers, no_cache, packed)
+    await asyncio.shield(job.done)
+    if job.state["status"] != "completed":
+        print("❌ BATCH ERROR:", job.state["error"])
+        raise HTTPException(status_code=500, detail=job.state["error"])
+    page = await asyncio.to_thread(_results_page, job, None, BATCH_PREVIEW_LIMIT, {})
+    return {**job.state["result"], "preview": page["items"], "next_cursor": page["next_cursor"]}
+
+
+@app.post("/batch/jobs")
+async def create_batch_job(
+    file: UploadFile = File(...),
+    workers: Optional[int] = Query(None, ge=0, description="Router processes (0/1 = serial)"),
+    no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+    packed: bool = Query(LLM_PACK_BATCH, description="Send several Complex rows per LLM request")
+):
+    """
+    Asynchronous upload: returns a job id at once; poll /batch/jobs/{id}
+    or follow /batch/jobs/{id}/events.
+    """
+    job = await _start_batch_job(file, workers, no_cache, packed)
+    return {"job_id": job.id, "status": job.state["status"]}
+
+
+@app.get("/batch/jobs")
+async def list_batch_jobs():
+    return batch_jobs.list()
+
+
+def _get_job(job_id: str) -> BatchJob:
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/batch/jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+def job_results(job: BatchJob) -> BatchResultStore:
+    return BatchResultStore(os.path.join(job.dir, "results.sqlite"))
+
+
+# (job id, run marker, filters) -> row count; only read and written on the event loop
+_results_totals: "OrderedDict[tuple, int]" = OrderedDict()
+
+
+def _results_total_key(job: BatchJob, filters: dict) -> Optional[tuple]:
+    """
+    Cache key of a job's result total, or None while the job can still add rows.
+    """
+    if job.state["status"] in ACTIVE_STATUSES:
+        return None
+    # A failed job can be resumed; its next run has a new checkpoint
+    return (job.id, job.state["status"], job.checkpoint["committed_rows"], tuple(filters.items()))
+
+
+def _results_page(job: BatchJob, cursor: Optional[str], limit: int, filters: dict) -> dict:
+    with closing(job_results(job)) as results:
+        return results.page(cursor, limit, **filters)
+
+
+@app.get("/batch/jobs/{job_id}/results")
+async def get_batch_job_results(
+    job_id: str,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    tag: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    action: Optional[str] = None
+):
+    """
+    Cursor-paginated result rows of a job (also while it is still running).
+    "total" is null while the job runs (use has_more); once it has finished,
+    it is counted once per filter and then served from memory.
+    """
+    job = _get_job(job_id)
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    filters = {"tag": tag, "sentiment": sentiment, "action": action}
+
+    total_key = _results_total_key(job, filters)
+    total = _results_totals.get(total_key) if total_key else None
+    if total_key and total is None and not any(filters.values()) and job.state.get("result"):
+        # Every processed row has exactly one result row
+        total = job.state["result"]["items"]
+
+    def read() -> dict:
+        with closing(job_results(job)) as results:
+            page = results.page(cursor, limit, **filters)
+            count = total if total is not None or total_key is None else results.count(**filters)
+            return {**page, "has_more": page["next_cursor"] is not None, "total": count}
+
+    body = await asyncio.to_thread(read)
+    if total_key:
+        _results_totals[total_key] = body["total"]
+        _results_totals.move_to_end(total_key)
+        while len(_results_totals) > BATCH_RESULTS_TOTALS_CACHE:
+            _results_totals.popitem(last=False)
+    return body
+
+
+@app.get("/batch/jobs/{job_id}/results/export")
+async def export_batch_job_results(
+    job_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    tag: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    action: Optional[str] = None
+):
+    """
+    Streams every (filtered) result row as NDJSON or CSV, a page at a time.
+    """
+    job = _get_job(job_id)
+    filters = {"tag": tag, "sentiment": sentiment, "action": action}
+
+    def rows():
+        with closing(job_results(job)) as results:
+            if format == "ndjson":
+                for row in results.iter_rows(**filters):
+                    yield json.dumps(row, ensure_ascii=False) + "\n"
+                return
+            buffer = StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=["row", *RESULT_FIELDS])
+            writer.writeheader()
+            for n, row in enumerate(results.iter_rows(**filters), start=1):
+                writer.writerow(row)
+                if n % 1000 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"batch_{job.id}.{format}"
+    return StreamingResponse(rows(), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@app.get("/batch/jobs/{job_id}/events")
+async def stream_batch_job(job_id: str):
+    """
+    Server-Sent Events: a "progress" event per update, then one "done" event.
+    """
+    _get_job(job_id)
+
+    async def events():
+        async for snapshot in batch_jobs.events(job_id):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            kind = "progress" if snapshot["status"] in ACTIVE_STATUSES else "done"
+            yield f"event: {kind}\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
    
 
 
@@ -386,38 +969,20 @@ async def batch_upload(file: UploadFile = File(...)):
 @app.get("/stats")
 async def get_dashboard_stats():
     """
-    Reads history and queue to provide accurate counters.
+    O(1): reads the counters maintained at write time by log_to_history,
+    log_to_review_queue and annotator_validate.
     """
     try:
-        # 1. Count Pending Reviews
-        pending_count = 0
-        if os.path.exists("data/human_review_queue.csv"):
-            with open("data/human_review_queue.csv", "r", encoding="utf-8") as f:
-                # Subtract header
-                pending_count = max(0, sum(1 for line in f) - 1)
-
-        # 2. Analyze History Log
-        total = 0
-        auto_resolved = 0
-        validated_count = 0
-        critical_count = 0
-        
-        if os.path.exists("data/history_log.csv"):
-            df = pd.read_csv("data/history_log.csv")
-            total = len(df)
-            
-            # Count Auto-Resolved (Simple)
-            if 'decision' in df.columns:
-                auto_resolved = len(df[df['decision'] == 'Simple'])
-            
-            # Count Validated (Items processed by human)
-            if 'status' in df.columns:
-                validated_count = len(df[df['status'] == 'Validated'])
-
-            # Count Critical Issues (For the 4th card)
-            # Check 'routing' or 'text' for keywords if tag column isn't explicitly 'Critical'
-            # But simpler: search for "Critical" in the whole row string
-            critical_count = df.astype(str).apply(lambda x: x.str.contains('Critical', case=False)).any(axis=1).sum()
+        counters = history_store.counters()
+
+        # 1. Pending Reviews
+        pending_count = max(0, counters.get("pending_reviews", 0))
+
+        # 2. History aggregates
+        total = counters.get("total", 0)
+        auto_resolved = counters.get("decision:Simple", 0)
+        validated_count = counters.get("status:Validated", 0)
+        critical_count = counters.get("critical", 0)
 
         # Total Human Interactions = Waiting in Queue + Already Validated
         human_review_total = pending_count + validated_count
@@ -446,56 +1011,54 @@ def home():
     return {"message": "System is Online. Use /analyze endpoint."}
 
 
-@app.get("/generate-report")
-async def get_executive_report():
+# --- EXECUTIVE REPORT ---
+# How many of the latest history rows are clustered for the report
+REPORT_WINDOW = int(os.getenv("REPORT_WINDOW", "5000"))
+REPORT_MAX_CLUSTERS = int(os.getenv("REPORT_MAX_CLUSTERS", "8"))
+# A cached report younger than this is served even if new complaints arrived
+REPORT_FRESH_SECONDS = float(os.getenv("REPORT_FRESH_SECONDS", "300"))
+REPORT_CACHE_FILE = "data/latest_report.json"
+
+report_cache = ReportCache(REPORT_CACHE_FILE)
+_report_build_lock = asyncio.Lock()
+_report_tasks = set()
+
+
+def build_executive_report() -> dict:
     """
-    Aggregates REAL data from history_log.csv -> Sends to Llama 3 -> Returns Strategy
+    Aggregates REAL data from the history store -> Sends to Llama 3 -> Returns Strategy
+    Blocking (SQLite + embeddings + LLM); run it off the event loop.
     """
-    history_path = "data/history_log.csv"
     recent_complaints = []
     total_count = 0
     simple_count = 0
     flagged_count = 0
 
-    print(f"[REPORT DEBUG] Looking for history file at: {os.path.abspath(history_path)}")
+    # 1. INDEXED HISTORY QUERIES
+    try:
+        counters = history_store.counters()
+        total_count = counters.get("total", 0)
+        simple_count = counters.get("decision:Simple", 0)
+        flagged_count = counters.get("decision:Review_Queue", 0)
+        print(f"[REPORT DEBUG] History rows: {total_count}")
+
+        # Recent window of non-empty texts; auto-resolved admin/praise rows
+        # are not technical issues, so they are left out of the clusters
+        recent_complaints = history_store.recent_texts(REPORT_WINDOW, exclude_decision="Simple")
+        print(f"[REPORT DEBUG] Extracted {len(recent_complaints)} recent complaints.")
+    except Exception as e:
+        print(f"[REPORT DEBUG] Error reading history: {e}")
+        traceback.print_exc()
 
-    if os.path.exists(history_path):
+    # 2. CLUSTER LOCALLY (embeddings + mini-batch k-means)
+    clusters = []
+    if recent_complaints:
         try:
-            # Check if file is empty
-            if os.path.getsize(history_path) == 0:
-                print("[REPORT DEBUG] History file exists but is EMPTY (0 bytes).")
-            else:
-                # Read CSV
-                df = pd.read_csv(history_path)
-                total_count = len(df)
-                print(f"[REPORT DEBUG] CSV loaded. Total rows: {total_count}")
-                print(f"[REPORT DEBUG] Columns found: {list(df.columns)}")
-
-                # Check if 'text' column exists (handle whitespace or case sensitivity)
-                # We normalize column names to lowercase to be safe
-                df.columns = [c.lower().strip() for c in df.columns]
-
-                if 'text' in df.columns:
-                    # Get last 30 non-empty texts
-                    recent_complaints = df['text'].dropna().tail(30).tolist()
-                    print(f"[REPORT DEBUG] Extracted {len(recent_complaints)} recent complaints.")
-                    if len(recent_complaints) > 0:
-                        print(f"[REPORT DEBUG] Sample: {recent_complaints[0][:50]}...")
-                else:
-                    print("[REPORT DEBUG] CRITICAL: 'text' column NOT found in CSV columns.")
-
-                # Calculate stats if columns exist
-                if 'decision' in df.columns:
-                    simple_count = len(df[df['decision'] == 'Simple'])
-                    flagged_count = len(df[df['decision'] == 'Review_Queue'])
-
+            clusters = cluster_complaints(recent_complaints, max_clusters=REPORT_MAX_CLUSTERS)
         except Exception as e:
-            print(f"[REPORT DEBUG] Error processing history file: {e}")
-            traceback.print_exc()
-    else:
-        print("[REPORT DEBUG] History file NOT FOUND.")
+            print(f"[REPORT DEBUG] Clustering failed, sending raw sample instead: {e}")
 
-    # 2. PREPARE PAYLOAD
+    # 3. PREPARE PAYLOAD
     stats = {
         "total_complaints": total_count,
         "period": datetime.now().strftime("%B %Y"),
@@ -504,48 +1067,106 @@ async def get_executive_report():
             "Complex (GPU Processed)": max(0, total_count - simple_count - flagged_count),
             "Human_Review (Drift/Sarcasm)": flagged_count
         },
-        "recent_complaints": recent_complaints 
+        "analyzed_window": len(recent_complaints),
+        "complaint_clusters": clusters,
+        # Only used when clustering is unavailable
+        "recent_complaints": [] if clusters else recent_complaints[-30:]
     }
 
-    print(f"[REPORT DEBUG] Sending payload to Llama 3 with {len(recent_complaints)} complaints.")
-    report = generate_executive_report(stats)
+    print(f"[REPORT DEBUG] Sending {len(clusters)} clusters ({len(recent_complaints)} complaints) to Llama 3.")
+    return generate_executive_report(stats)
 
-    return {"report": report}
-    # 2. PREPARE PAYLOAD
-    # We pass the LIST of texts, not hardcoded issues
-    stats = {
-        "total_complaints": total_count,
-        "period": datetime.now().strftime("%B %Y"),
-        "triage_breakdown": {
-            "Simple (Auto-Resolved)": simple_count,
-            "Complex (GPU Processed)": max(0, total_count - simple_count - flagged_count),
-            "Human_Review (Drift/Sarcasm)": flagged_count
-        },
-        "recent_complaints": recent_complaints  # <--- This is the key fix
+
+async def history_watermark() -> list:
+    """
+    Cheap change marker for the history: [last row seq], read off the event loop.
+    """
+    return await asyncio.to_thread(history_store.watermark)
+
+
+def _usable_report(report: dict) -> bool:
+    # The LLM fallback ("Unable to generate plan...") has no issues; never cache it
+    return bool(report.get("top_issues")) and "error" not in report
+
+
+async def _refresh_report(watermark: list) -> Optional[dict]:
+    try:
+        report = await asyncio.to_thread(build_executive_report)
+        if _usable_report(report):
+            return report_cache.put(report, watermark)
+        print("[REPORT] Refresh produced no usable report; keeping the cached copy.")
+        return None
+    except Exception as e:
+        print(f"[REPORT] Refresh failed: {e}")
+        traceback.print_exc()
+        return None
+    finally:
+        report_cache.end_refresh()
+
+
+def _report_response(entry: dict, cached: bool, stale: bool = False) -> dict:
+    return {
+        "report": entry["report"],
+        "cached": cached,
+        "stale": stale,
+        "generated_at": datetime.fromtimestamp(entry["generated_at"]).isoformat()
     }
 
-    print(f"Generating report with Llama 3 using {len(recent_complaints)} items...")
-    report = generate_executive_report(stats)
 
-    return {"report": report}
+@app.get("/generate-report")
+async def get_executive_report(refresh: bool = False):
+    """
+    Serves the cached report while the history watermark is unchanged (or the
+    report is younger than REPORT_FRESH_SECONDS). A stale report is served
+    immediately and rebuilt in the background; ?refresh=true forces a rebuild.
+    """
+    watermark = await history_watermark()
+    entry = report_cache.get()
+
+    if entry is not None and not refresh:
+        age = time.time() - entry["generated_at"]
+        if entry["watermark"] == watermark or age < REPORT_FRESH_SECONDS:
+            report_cache.record("hit")
+            return _report_response(entry, cached=True)
+
+        report_cache.record("stale")
+        if report_cache.try_begin_refresh():
+            print("[REPORT] History changed; refreshing report in the background.")
+            task = asyncio.create_task(_refresh_report(watermark))
+            _report_tasks.add(task)
+            task.add_done_callback(_report_tasks.discard)
+        return _report_response(entry, cached=True, stale=True)
+
+    # Cold (or forced): build inline, but only one build at a time
+    report_cache.record("miss")
+    async with _report_build_lock:
+        fresh = report_cache.get()
+        if fresh is not None and not refresh and fresh["watermark"] == watermark:
+            return _report_response(fresh, cached=True)
+        report = await asyncio.to_thread(build_executive_report)
+
+    if _usable_report(report):
+        return _report_response(report_cache.put(report, watermark), cached=False)
+    if entry is not None:
+        # The LLM is unavailable: the previous report beats an empty one
+        return _report_response(entry, cached=True, stale=True)
+    return {"report": report, "cached": False, "stale": False, "generated_at": None}
+
+
+@app.get("/report/stats")
+async def get_report_stats():
+    return {"watermark": await history_watermark(), **report_cache.stats()}
 
 @app.get("/annotator/queue")
 async def get_annotator_queue():
-    file_path = "data/human_review_queue.csv"
-
-    if not os.path.exists(file_path):
-        return []
-
     try:
-        with open(file_path, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+        rows = review_queue.rows()
 
         return [
             {
                 "id": row.get("id"),
                 "text": row.get("text"),
-                "reason": row.get("reason"),
+                "reason": row.get("reason_for_flagging"),
             }
             for row in rows
             if row.get("text")  # safety
@@ -556,6 +1177,11 @@ async def get_annotator_queue():
         return []
 
 
+@app.get("/annotator/queue/stats")
+async def get_annotator_queue_stats():
+    return review_queue.stats()
+
+
 # ------------------------------------------------------------------
 # ANNOTATOR: Validate / Push Human-Reviewed Item -> Persist to history
 # ------------------------------------------------------------------
@@ -595,34 +1221,19 @@ async def annotator_validate(payload: dict = Body(...)):
         }
 
         # ✅ Persist to history
-        log_to_history(final_response)
-
-        # ✅ Remove from human_review_queue.csv using ID
-        hr_path = "data/human_review_queue.csv"
-        if os.path.exists(hr_path):
-            with open(hr_path, "r", newline="", encoding="utf-8") as f:
-                reader = list(csv.DictReader(f))
+        await log_to_history(final_response)
 
-            if reader:
-                remaining = []
-                removed = False
+        # ✅ Human says this was really a Simple case -> learn it as a router anchor
+        anchor_label = ANCHOR_LABELS.get(str(corrected_label).lower().strip())
+        if anchor_label and text.strip():
+            try:
+                await asyncio.to_thread(add_anchors, [text.strip()], [anchor_label])
+            except Exception as e:
+                print(f"[ANNOTATOR] Failed to add anchor: {e}")
 
-                for row in reader:
-                    if row.get("id") == cid:
-                        removed = True
-                        continue
-                    remaining.append(row)
-
-                with open(hr_path, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.DictWriter(
-                        f,
-                        fieldnames=["id", "text", "reason_for_flagging"]
-                    )
-                    writer.writeheader()
-                    writer.writerows(remaining)
-
-                if removed:
-                    print(f"[ANNOTATOR] Removed validated item from human_review_queue: {cid}")
+        # ✅ Remove from the review queue using ID (a tombstone append, not a file rewrite)
+        if await asyncio.to_thread(_validate_review, cid):
+            print(f"[ANNOTATOR] Removed validated item from human_review_queue: {cid}")
 
         return {"status": "ok", "id": cid, "message": "Validated and persisted."}
 
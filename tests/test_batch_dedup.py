@@ -0,0 +1,47 @@
+from app.core.batch_dedup import BatchDeduper
+
+
+def _route(texts):
+    # Stand-in router: lazy, in order, one result per text
+    for text in texts:
+        yield text, f"routed:{text}"
+
+
+def _run(texts, window_size=256, max_backlog=4096):
+    dedup = BatchDeduper(max_backlog=max_backlog)
+    windows, max_buffered = [], 0
+    for window in dedup.windows(_route(dedup.unique(texts)), window_size):
+        max_buffered = max(max_buffered, len(dedup._rows))
+        windows.append(window)
+    return windows, max_buffered
+
+
+def test_windows_stay_bounded_on_long_duplicate_runs():
+    windows, max_buffered = _run(["same complaint"] * 200_000)
+    assert sum(len(w) for w in windows) == 200_000
+    assert max(len(w) for w in windows) <= 256
+    assert max_buffered <= 4096
+    assert sum(1 for w in windows for row in w if row[2]) == 1
+
+
+def test_rows_come_back_in_upload_order_with_first_occurrences_routed():
+    texts = [f"text {i % 7}" if i % 3 else f"Text  {i % 7}" for i in range(1000)]
+    windows, _ = _run(texts, window_size=16, max_backlog=64)
+    rows = [row for w in windows for row in w]
+    assert [text for text, _, _, _ in rows] == texts
+    assert max(len(w) for w in windows) <= 16
+    firsts = [(text, result) for text, _, first, result in rows if first]
+    assert len(firsts) == 7
+    assert all(result == f"routed:{text}" for text, result in firsts)
+
+
+def test_remembered_texts_are_capped():
+    dedup = BatchDeduper(max_backlog=8, max_texts=100)
+    texts = [f"complaint {i}" for i in range(10_000)]
+    for window in dedup.windows(_route(dedup.unique(texts)), 64):
+        for text, key, first, _ in window:
+            dedup.set_outcome(key, ("Simple", "General", "Neutral", 0.0, "Auto-Reply"))
+    assert len(dedup._outcomes) == 100
+    # Recent texts still collapse; evicted ones are routed again
+    assert dedup.outcome(BatchDeduper.key("complaint 9999")) is not None
+    assert dedup.outcome(BatchDeduper.key("complaint 0")) is None
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import os
+import time
+
+from app.core.batch_jobs import BatchJobManager
+
+
+def test_prune_removes_old_finished_jobs_only(tmp_path):
+    async def runner(job):
+        return {"items": 0}
+
+    async def run():
+        manager = BatchJobManager(str(tmp_path), runner)
+        jobs = [manager.create(io.BytesIO(b"text\nhi\n"), "a.csv", {}) for _ in range(3)]
+        for job in jobs:
+            manager.start(job)
+            await job.done
+        return manager, jobs
+
+    manager, (old, kept, recent) = asyncio.run(run())
+    assert not os.path.exists(old.upload_path)
+    old.state["finished_at"] = kept.state["finished_at"] = time.time() - 7200
+
+    assert manager.prune(3600, keep=[kept.id]) == 1
+    assert not os.path.exists(old.dir)
+    assert os.path.exists(kept.dir) and os.path.exists(recent.dir)
+    assert manager.get(old.id) is None
+
+
+def test_failure_during_shutdown_keeps_job_resumable(tmp_path):
+    async def runner(job):
+        manager._stopping = True
+        raise RuntimeError("cannot schedule new futures after shutdown")
+
+    manager = BatchJobManager(str(tmp_path), runner)
+
+    async def run():
+        job = manager.create(io.BytesIO(b"text\nhi\n"), "a.csv", {})
+        manager.start(job)
+        await asyncio.gather(*manager._tasks)
+        return job
+
+    job = asyncio.run(run())
+    assert job.state["status"] == "running"
+    assert os.path.exists(job.upload_path)
+
+
+def test_progress_counts_rows_processed_not_bytes_read(tmp_path):
+    async def runner(job):
+        return {}
+
+    async def run():
+        manager = BatchJobManager(str(tmp_path), runner)
+        job = manager.create(io.BytesIO(b"text\n" + b"complaint\n" * 40), "a.csv", {})
+        job._run_started = time.perf_counter() - 2.0
+        total = job.state["progress"]["bytes_total"]
+        # The whole (small) file is read and parsed, half of it is processed
+        job.progress(rows_read=40, bytes_read=total, bytes_parsed=total, rows_routed=20)
+        return job.state["progress"]
+
+    progress = asyncio.run(run())
+    assert progress["rows_total_estimate"] == 40
+    assert progress["percent"] == 50.0
+    assert progress["rows_per_sec"] == 10.0
+    assert progress["eta_seconds"] == 2.0
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.core.batcher import MicroBatcher
+
+
+def _upper(items):
+    if "bad" in items:
+        raise ValueError("bad item")
+    return [item.upper() for item in items]
+
+
+def test_failed_batch_only_fails_the_item_that_raised():
+    async def run():
+        batcher = MicroBatcher(_upper, max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(item) for item in ["a", "bad", "c"]), return_exceptions=True
+            ), batcher.stats()
+        finally:
+            await batcher.stop()
+
+    (a, bad, c), stats = asyncio.run(run())
+    assert (a, c) == ("A", "C")
+    assert isinstance(bad, ValueError)
+    assert stats["batches"] == 1 and stats["errors"] == 1
+
+
+def test_single_item_failure_is_raised_to_its_caller():
+    async def run():
+        batcher = MicroBatcher(_upper, max_wait_ms=1)
+        await batcher.start()
+        try:
+            await batcher.submit("bad")
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
@@ -0,0 +1,36 @@
+import csv
+import io
+
+from app.core import csv_stream
+from app.core.csv_stream import CSVStream
+
+
+def test_oversized_field_is_accepted():
+    big = "x" * 200_000
+    raw = io.BytesIO(f"id,text\n1,{big}\n2,short\n".encode("utf-8"))
+    stream = CSVStream(raw, chunk_size=4096)
+    assert list(stream.texts()) == [big, "short"]
+    assert stream.skipped_rows == 0
+
+
+def test_field_over_the_limit_skips_only_that_row():
+    previous = csv.field_size_limit(50)
+    try:
+        raw = io.BytesIO(("text\n" + "y" * 100 + "\nfine\n").encode("utf-8"))
+        stream = CSVStream(raw, chunk_size=16)
+        assert list(stream.texts()) == ["fine"]
+        assert stream.skipped_rows == 1
+    finally:
+        csv.field_size_limit(previous)
+    assert csv_stream.MAX_FIELD_CHARS >= 200_000
+
+
+def test_bytes_parsed_trails_bytes_read():
+    raw = io.BytesIO(("text\n" + "".join(f"row {i}\n" for i in range(1000))).encode("utf-8"))
+    stream = CSVStream(raw, chunk_size=1 << 20)
+    texts = stream.texts()
+    next(texts)
+    assert stream.bytes_read == len(raw.getvalue())
+    assert stream.bytes_parsed < stream.bytes_read / 10
+    list(texts)
+    assert stream.bytes_parsed == stream.bytes_read
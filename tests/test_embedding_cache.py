@@ -0,0 +1,20 @@
+import numpy as np
+
+from app.core.embedding_cache import EmbeddingCache
+
+
+def test_disk_store_is_trimmed_to_its_bound(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(max_entries=10, path=path, max_disk_entries=100)
+    for start in range(0, 500, 50):
+        texts = [f"complaint {i}" for i in range(start, start + 50)]
+        cache.put_many(texts, np.ones((50, 4), dtype=np.float32))
+
+    rows = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert rows <= 110
+
+    reopened = EmbeddingCache(max_entries=10, path=path, max_disk_entries=100)
+    assert reopened.stats()["disk_entries"] == 100
+    # Newest rows survive, oldest are gone
+    newest, oldest = reopened.get_many(["complaint 499", "complaint 0"])
+    assert newest is not None and oldest is None
@@ -0,0 +1,9 @@
+from app.core.history_store import HistoryStore
+
+
+def test_existing_ids_finds_rows_already_written(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    store.append_many([{"timestamp": "t", "id": f"req_job_{i}"} for i in range(3)])
+    ids = [f"req_job_{i}" for i in range(5)]
+    assert store.existing_ids(ids) == {"req_job_0", "req_job_1", "req_job_2"}
+    assert store.existing_ids([]) == set()
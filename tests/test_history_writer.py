@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+from app.core.history_writer import HistoryWriter
+
+
+class SlowStore:
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.rows = []
+        self._lock = threading.Lock()
+
+    def write(self, group):
+        time.sleep(self.delay)
+        with self._lock:
+            self.rows.extend(group)
+        return len(group)
+
+
+async def _submit_and_wait_for_pickup(writer: HistoryWriter, n: int):
+    await writer.start()
+    for i in range(n):
+        await writer.submit({"id": i})
+    # Let the worker dequeue the rows and start the (slow) group write
+    while writer._queue.qsize() or writer._pending or writer._inflight is None:
+        await asyncio.sleep(0.01)
+
+
+def test_flush_waits_for_group_write_in_progress():
+    async def run():
+        store = SlowStore()
+        writer = HistoryWriter(store.write, group_size=500, flush_interval_ms=10)
+        await _submit_and_wait_for_pickup(writer, 5)
+        await writer.flush()
+        written = len(store.rows)
+        await writer.stop()
+        return written
+
+    assert asyncio.run(run()) == 5
+
+
+def test_stop_waits_for_group_write_in_progress():
+    async def run():
+        store = SlowStore()
+        writer = HistoryWriter(store.write, group_size=500, flush_interval_ms=10)
+        await _submit_and_wait_for_pickup(writer, 5)
+        await writer.stop()
+        return len(store.rows)
+
+    assert asyncio.run(run()) == 5
+
+
+def test_stop_writes_rows_still_queued():
+    async def run():
+        store = SlowStore(delay=0.0)
+        writer = HistoryWriter(store.write, group_size=2, flush_interval_ms=1000)
+        await writer.start()
+        for i in range(7):
+            await writer.submit({"id": i})
+        await writer.stop()
+        return [row["id"] for row in store.rows]
+
+    assert sorted(asyncio.run(run())) == list(range(7))
+
+
+def test_rows_dequeued_after_a_flush_are_not_lost():
+    async def run():
+        store = SlowStore(delay=0.0)
+        writer = HistoryWriter(store.write, group_size=500, flush_interval_ms=1000)
+        await writer.start()
+        await writer.submit({"id": 0})
+        # The worker holds row 0 in _pending and waits for more
+        while writer._queue.qsize() or not writer._pending:
+            await asyncio.sleep(0.01)
+        await writer.flush()
+        await writer.submit({"id": 1})
+        await asyncio.sleep(0.05)
+        await writer.flush()
+        written = [row["id"] for row in store.rows]
+        await writer.stop()
+        return written
+
+    assert asyncio.run(run()) == [0, 1]
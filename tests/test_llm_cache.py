@@ -0,0 +1,22 @@
+from app.core.llm_cache import LLMCache
+
+
+def test_get_many_returns_hits_and_defers_access_updates(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many([("a", {"v": 1}), ("b", {"v": 2})])
+    before = dict(cache._db.execute("SELECT key, last_access FROM llm_cache").fetchall())
+
+    assert cache.get_many(["a", "b", "c", "a"]) == {"a": {"v": 1}, "b": {"v": 2}}
+    assert (cache.hits, cache.misses) == (2, 1)
+    # Hits are only recorded in memory until the next flush
+    assert dict(cache._db.execute("SELECT key, last_access FROM llm_cache").fetchall()) == before
+    assert set(cache._touched) == {"a", "b"}
+
+
+def test_row_count_is_tracked_across_puts_and_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_entries=150)
+    cache.put_many([(f"k{i}", {"v": i}) for i in range(120)])
+    cache.put_many([(f"k{i}", {"v": -i}) for i in range(100, 200)])
+    real = cache._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    assert cache.stats()["entries"] == real == 150
+    assert cache.evictions == 50
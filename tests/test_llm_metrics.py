@@ -0,0 +1,16 @@
+from app.core.llm_backends import LLMResponse
+from app.core.llm_metrics import LLMMetrics
+
+
+def test_breaker_rejections_are_not_counted_as_calls():
+    metrics = LLMMetrics(price_input_per_mtok=1.0, price_output_per_mtok=1.0)
+    metrics.record("analysis", "m", 250.0, LLMResponse("{}", 100, 10))
+    metrics.record("analysis", "m", 900.0, outcome="error")
+    metrics.record_rejected("analysis")
+    metrics.record_rejected("analysis")
+
+    analysis = metrics.stats()["endpoints"]["analysis"]
+    assert analysis["calls"] == 2
+    assert analysis["outcomes"] == {"success": 1, "error": 1, "circuit_open": 2}
+    assert analysis["latency_ms"]["window"] == 2
+    assert analysis["latency_ms"]["mean"] == 575.0
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core import parallel_router, router
+
+
+class FakePool(ThreadPoolExecutor):
+    def __init__(self, max_workers, mp_context=None, initializer=None):
+        super().__init__(max_workers=max_workers)
+        self.closed = False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.closed = True
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+@pytest.fixture
+def fake_pools(monkeypatch):
+    version = {"value": 0}
+    monkeypatch.setattr(parallel_router, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(parallel_router, "_route_chunk", lambda texts: [f"routed:{t}" for t in texts])
+    monkeypatch.setattr(router, "anchors_version", lambda: version["value"])
+    yield version
+    parallel_router.shutdown_pool()
+
+
+def test_running_stream_survives_pool_replacement(fake_pools):
+    texts = [f"t{i}" for i in range(50)]
+    first = parallel_router.route_complaints_parallel(iter(texts), workers=2, chunk_size=4)
+    assert next(first) == ("t0", "routed:t0")
+    old_pool = parallel_router._pool
+
+    # Another job with a different worker count, then new anchors
+    second = list(parallel_router.route_complaints_parallel(iter(texts), workers=3, chunk_size=4))
+    fake_pools["value"] += 1
+    third = list(parallel_router.route_complaints_parallel(iter(texts), workers=3, chunk_size=4))
+    assert second == third == [(t, f"routed:{t}") for t in texts]
+    assert parallel_router._pool is not old_pool
+    assert not old_pool.closed
+
+    rest = list(first)
+    assert rest == [(t, f"routed:{t}") for t in texts[1:]]
+    # Retired once its last stream finished
+    assert old_pool.closed